@@ -0,0 +1,54 @@
+"""
+离线基准测试：本地模拟 Tidal API 与 DASH CDN，端到端运行一次下载并输出 JSON 报告
+
+    python -m streamfetch.bench --tracks 30 --latency 0.05 --output bench.json
+    python -m streamfetch.bench --set network.concurrency=8 --set ffmpeg.pipe_input=true
+"""
+
+import json
+from pathlib import Path
+from typing import List, Optional
+
+import typer
+
+from streamfetch.bench.runner import parse_overrides, run_benchmark
+from streamfetch.bench.server import BenchProfile
+
+
+def main(
+    tracks: int = typer.Option(20, help="曲目数"),
+    segments: int = typer.Option(20, help="每首歌的分段数"),
+    segment_kb: int = typer.Option(64, help="每个分段的大小 (KB)"),
+    latency: float = typer.Option(0.02, help="每个请求的固定延迟 (秒)"),
+    bandwidth_mb: float = typer.Option(0.0, help="每个连接的带宽 (MB/s)，0 表示不限"),
+    error_rate: float = typer.Option(0.0, help="返回 429/5xx 的概率"),
+    stall_rate: float = typer.Option(0.0, help="分段请求卡住的概率"),
+    stall_seconds: float = typer.Option(5.0, help="卡住的时长 (秒)"),
+    source: str = typer.Option("album", help="下载来源: album / playlist"),
+    overrides: Optional[List[str]] = typer.Option(
+        None, "--set", help="覆盖配置项，如 network.concurrency=8，可重复"
+    ),
+    output: Optional[Path] = typer.Option(None, help="同时把报告写入该文件"),
+    keep: bool = typer.Option(False, help="保留临时目录 (下载结果与数据库)"),
+):
+    if source not in ("album", "playlist"):
+        raise typer.BadParameter("source 只能是 album 或 playlist")
+    profile = BenchProfile(
+        tracks,
+        segments,
+        segment_kb,
+        latency,
+        bandwidth_mb,
+        error_rate,
+        stall_rate,
+        stall_seconds,
+    )
+    report = run_benchmark(profile, source, parse_overrides(overrides), keep)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output is not None:
+        output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+if __name__ == "__main__":
+    typer.run(main)
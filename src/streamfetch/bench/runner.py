@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, Optional
+
+import yaml
+
+from streamfetch.bench.server import ALBUM_ID, PLAYLIST_ID, BenchProfile
+
+_SRC_DIR = Path(__file__).resolve().parents[2]
+
+
+class BenchServer:
+    """以子进程运行模拟服务器，下载端与服务端不共用一个 GIL"""
+
+    def __init__(self, profile: BenchProfile):
+        args = [sys.executable, "-m", "streamfetch.bench.server"]
+        for key, value in profile.to_dict().items():
+            args += [f"--{key.replace('_', '-')}", str(value)]
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            p for p in (str(_SRC_DIR), env.get("PYTHONPATH")) if p
+        )
+        self._proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            env=env,
+        )
+        line = self._proc.stdout.readline()
+        if not line:
+            raise Exception("模拟服务器启动失败")
+        self.url = json.loads(line)["url"]
+
+    def stats(self) -> dict:
+        self._proc.stdin.write("stats\n")
+        self._proc.stdin.flush()
+        return json.loads(self._proc.stdout.readline())
+
+    def stop(self):
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(timeout=5)
+        except Exception:
+            self._proc.kill()
+
+
+def _write_config(workdir: Path, url: str, overrides: Dict[str, dict]):
+    """隔离的 config.yml：API 指向模拟服务器，不使用元数据缓存"""
+    settings = {
+        "general": {"download_dir": "./out"},
+        "network": {"api_urls": [url]},
+        "cache": {"enabled": False},
+    }
+    for section, values in overrides.items():
+        settings.setdefault(section, {}).update(values)
+    with open(workdir / "config.yml", "w", encoding="utf-8") as f:
+        yaml.safe_dump(settings, f, allow_unicode=True)
+
+
+def parse_overrides(items) -> Dict[str, dict]:
+    """把 ["network.concurrency=8", ...] 解析为 {"network": {"concurrency": 8}}"""
+    overrides: Dict[str, dict] = {}
+    for item in items or []:
+        key, sep, value = item.partition("=")
+        section, dot, name = key.strip().partition(".")
+        if not sep or not dot or not name:
+            raise Exception(f"无效的配置覆盖: {item} (格式: section.key=value)")
+        overrides.setdefault(section, {})[name] = yaml.safe_load(value)
+    return overrides
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 的单位为 KB，macOS 为字节
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _version() -> str:
+    try:
+        return metadata.version("streamfetch")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def _download(url: str, source: str) -> dict:
+    """在当前目录的 config.yml 下端到端运行一次下载，返回耗时与进程内指标"""
+    # 以下模块在导入时读取 config.yml，必须在切换到临时目录之后导入
+    import streamfetch.media.cover as cover
+    from streamfetch.config.settings import config
+    from streamfetch.tidal.api import TidalApi
+    from streamfetch.tidal.downloader import TidalDownloader
+    from streamfetch.utils.logging_config import console
+    from streamfetch.utils.lrclib import LRCLib
+    from streamfetch.utils.metrics import metrics
+
+    cover.COVER_URL = f"{url}/images/{{path}}/1280x1280.jpg"
+    LRCLib.BASE_URL = f"{url}/lrclib"
+    logging.getLogger("streamfetch").setLevel(logging.ERROR)
+    console.quiet = True
+
+    api = TidalApi()
+    downloader = TidalDownloader(api)
+    download_dir = Path(config["general"]["download_dir"]).resolve()
+    download_dir.mkdir(parents=True, exist_ok=True)
+
+    started = time.monotonic()
+    if source == "playlist":
+        downloader.download_playlist(api.iter_playlist(PLAYLIST_ID), download_dir)
+    else:
+        downloader.download_album(ALBUM_ID, download_dir)
+    elapsed = time.monotonic() - started
+
+    return {
+        "elapsed": elapsed,
+        "completed": sum(1 for _ in download_dir.rglob("*.flac")),
+        "metrics": metrics.snapshot(),
+    }
+
+
+def run_benchmark(
+    profile: BenchProfile,
+    source: str = "album",
+    overrides: Optional[Dict[str, dict]] = None,
+    keep: bool = False,
+) -> dict:
+    """
+    启动模拟服务器，在临时目录中下载整张专辑 (或歌单)，返回 JSON 可序列化的报告
+    同一进程只能运行一次：各模块的单例在首次导入时按当时的配置创建
+    """
+    server = BenchServer(profile)
+    workdir = Path(tempfile.mkdtemp(prefix="sf-bench-"))
+    cwd = Path.cwd()
+    try:
+        _write_config(workdir, server.url, overrides or {})
+        os.chdir(workdir)
+        result = _download(server.url, source)
+        server_stats = server.stats()
+    finally:
+        os.chdir(cwd)
+        server.stop()
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    elapsed = result["elapsed"]
+    snapshot = result["metrics"]
+    stages = {
+        name.split(".", 1)[1]: {
+            "count": t["count"],
+            "p50_ms": _ms(t["p50"]),
+            "p99_ms": _ms(t["p99"]),
+        }
+        for name, t in snapshot["timings"].items()
+        if name.startswith("stage.")
+    }
+    return {
+        "version": _version(),
+        "source": source,
+        "profile": profile.to_dict(),
+        "overrides": overrides or {},
+        "tracks": profile.tracks,
+        "completed": result["completed"],
+        "failed": profile.tracks - result["completed"],
+        "elapsed_s": round(elapsed, 3),
+        "tracks_per_min": round(result["completed"] / elapsed * 60, 2),
+        "mb_per_s": round(server_stats["audio_bytes"] / elapsed / 1024 / 1024, 2),
+        "stages": stages,
+        "peak_rss_mb": _peak_rss_mb(),
+        "server": server_stats,
+        "counters": snapshot["counters"],
+        "gauges": snapshot["gauges"],
+        "workdir": str(workdir) if keep else None,
+    }
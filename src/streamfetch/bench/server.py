@@ -0,0 +1,355 @@
+"""
+离线基准测试用的本地服务器：模拟 Tidal API 镜像与 DASH CDN
+
+单独运行 (由 streamfetch.bench 以子进程启动，避免与下载端争抢 GIL)：
+    python -m streamfetch.bench.server --port 0 --tracks 20
+启动后在标准输出打印一行 JSON：{"url": "http://127.0.0.1:端口"}
+"""
+
+import base64
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import typer
+
+ALBUM_ID = 1
+PLAYLIST_ID = "bench-playlist"
+SAMPLE_RATE = 44100
+FRAME_SAMPLES = 4096
+# 专辑接口内嵌的曲目数上限，超出部分走 /album/items/ 分页
+ALBUM_EMBED_LIMIT = 100
+_WRITE_CHUNK = 16 * 1024
+
+
+class BenchProfile:
+    """模拟的网络与曲库条件"""
+
+    def __init__(
+        self,
+        tracks: int = 20,
+        segments: int = 20,
+        segment_kb: int = 64,
+        latency: float = 0.02,
+        bandwidth_mb: float = 0.0,
+        error_rate: float = 0.0,
+        stall_rate: float = 0.0,
+        stall_seconds: float = 5.0,
+    ):
+        self.tracks = tracks
+        self.segments = segments
+        self.segment_kb = segment_kb
+        # 每个请求的固定延迟 (秒)
+        self.latency = latency
+        # 每个连接的带宽 (MB/s)，0 表示不限
+        self.bandwidth_mb = bandwidth_mb
+        # 返回 429/500/503 的概率 (封面除外)
+        self.error_rate = error_rate
+        # 分段请求卡住 stall_seconds 秒的概率，用于模拟掉队连接
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+# ---------- fMP4 (FLAC) 数据 ----------
+
+
+def _box(kind: str, *parts: bytes) -> bytes:
+    body = b"".join(parts)
+    return struct.pack(">I4s", 8 + len(body), kind.encode()) + body
+
+
+def _full_box(kind: str, version: int, flags: int, *parts: bytes) -> bytes:
+    return _box(kind, bytes([version]) + flags.to_bytes(3, "big"), *parts)
+
+
+def init_segment() -> bytes:
+    """ftyp + moov，音频编码为 fLaC，dfLa 中携带 STREAMINFO"""
+    info = (SAMPLE_RATE << 44) | (1 << 41) | (15 << 36)
+    streaminfo = (
+        struct.pack(">HH", FRAME_SAMPLES, FRAME_SAMPLES)
+        + b"\0" * 6
+        + info.to_bytes(8, "big")
+        + b"\0" * 16
+    )
+    dfla = _full_box(
+        "dfLa", 0, 0, bytes([0x80]) + len(streaminfo).to_bytes(3, "big") + streaminfo
+    )
+    entry = _box(
+        "fLaC",
+        b"\0" * 6 + struct.pack(">H", 1) + b"\0" * 8,
+        struct.pack(">HH", 2, 16) + b"\0" * 4 + struct.pack(">I", SAMPLE_RATE << 16),
+        dfla,
+    )
+    stsd = _full_box("stsd", 0, 0, struct.pack(">I", 1), entry)
+    mdhd = _full_box(
+        "mdhd", 0, 0, struct.pack(">IIII", 0, 0, SAMPLE_RATE, 0), b"\0" * 4
+    )
+    trak = _box("trak", _box("mdia", mdhd, _box("minf", _box("stbl", stsd))))
+    trex = _full_box("trex", 0, 0, struct.pack(">IIIII", 1, 1, FRAME_SAMPLES, 0, 0))
+    return _box("ftyp", b"iso6\0\0\0\0") + _box("moov", trak, _box("mvex", trex))
+
+
+def media_segment(size: int, seed: int) -> bytes:
+    """moof + mdat，mdat 中是约 size 字节的 FLAC 帧 (内容随机，只用于传输与封装)"""
+    rnd = random.Random(seed)
+    frames: List[bytes] = []
+    remaining = max(64, size)
+    while remaining > 0:
+        n = min(remaining, rnd.randint(2000, 8000))
+        frames.append(b"\xff\xf8" + rnd.randbytes(max(0, n - 2)))
+        remaining -= n
+
+    def moof(data_offset: int) -> bytes:
+        trun = _full_box(
+            "trun",
+            0,
+            0x201,
+            struct.pack(">Ii", len(frames), data_offset),
+            *[struct.pack(">I", len(f)) for f in frames],
+        )
+        tfhd = _full_box("tfhd", 0, 0x020000, struct.pack(">I", 1))
+        tfdt = _full_box("tfdt", 0, 0, b"\0" * 4)
+        mfhd = _full_box("mfhd", 0, 0, struct.pack(">I", 1))
+        return _box("moof", mfhd, _box("traf", tfhd, tfdt, trun))
+
+    header = moof(0)
+    header = moof(len(header) + 8)
+    return header + _box("mdat", *frames)
+
+
+# ---------- 曲库 ----------
+
+
+def _track(i: int) -> dict:
+    return {
+        "id": 1000 + i,
+        "title": f"Bench Track {i}",
+        "trackNumber": i,
+        "volumeNumber": 1,
+        "duration": 200,
+        "explicit": False,
+        "audioQuality": "LOSSLESS",
+        "streamStartDate": "2024-01-01T00:00:00.000+0000",
+        "artist": {"id": 1, "name": "Bench Artist"},
+        "artists": [{"id": 1, "name": "Bench Artist"}],
+        "album": {"id": ALBUM_ID, "title": "Bench Album", "cover": "bench-cover"},
+        "mediaMetadata": {"tags": ["LOSSLESS"]},
+    }
+
+
+def _manifest(base_url: str, track_id: str, segments: int) -> str:
+    xml = (
+        '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011"><Period><AdaptationSet>'
+        f"<Representation><BaseURL>{base_url}/seg/{track_id}/</BaseURL>"
+        '<SegmentTemplate initialization="init.mp4" media="$Number$.mp4" '
+        f'startNumber="1"><SegmentTimeline><S d="{FRAME_SAMPLES}" r="{segments - 1}"/>'
+        "</SegmentTimeline></SegmentTemplate></Representation>"
+        "</AdaptationSet></Period></MPD>"
+    )
+    return base64.b64encode(xml.encode()).decode()
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端放弃请求 (如掉队分段的对冲副本先完成) 时连接被重置，属于正常情况
+        pass
+
+
+class MockTidalServer:
+    """在后台线程中运行的模拟服务器，统计请求数、错误数与发送的音频字节数"""
+
+    def __init__(self, profile: BenchProfile, port: int = 0):
+        self.profile = profile
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "errors": 0,
+            "stalls": 0,
+            "segments": 0,
+            "audio_bytes": 0,
+        }
+        self._lock = threading.Lock()
+        self._init = init_segment()
+        # 所有曲目共用同一组分段数据，避免生成数据本身成为瓶颈
+        segment_size = profile.segment_kb * 1024
+        self._segments = [
+            media_segment(segment_size, seed) for seed in range(profile.segments)
+        ]
+        self._httpd = _QuietHTTPServer(("127.0.0.1", port), self._handler())
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def start(self):
+        threading.Thread(
+            target=self._httpd.serve_forever, name="bench-server", daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def route(self, path: str, query: dict):
+        """返回 (状态码, 响应体, Content-Type)"""
+        profile = self.profile
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["100"])[0])
+        tracks = range(1, profile.tracks + 1)
+
+        if path == "/info/":
+            track_id = int(query["id"][0])
+            return 200, {"data": _track(track_id - 1000)}, None
+        if path == "/track/":
+            manifest = _manifest(self.url, query["id"][0], profile.segments)
+            return 200, {"data": {"manifest": manifest}}, None
+        if path == "/search/":
+            items = [_track(i) for i in tracks][:limit]
+            return 200, {"data": {"items": items}}, None
+        if path == "/album/":
+            embedded = [{"item": _track(i)} for i in tracks][:ALBUM_EMBED_LIMIT]
+            album = {
+                "id": ALBUM_ID,
+                "title": "Bench Album",
+                "artist": {"name": "Bench Artist"},
+                "numberOfTracks": profile.tracks,
+                "cover": "bench-cover",
+                "items": embedded,
+            }
+            return 200, {"data": album}, None
+        if path == "/album/items/":
+            items = [{"item": _track(i)} for i in tracks][offset : offset + limit]
+            page = {"items": items, "totalNumberOfItems": profile.tracks}
+            return 200, page, None
+        if path == "/playlist/":
+            items = [{"item": _track(i), "type": "track"} for i in tracks]
+            info = {
+                "uuid": PLAYLIST_ID,
+                "title": "Bench Playlist",
+                "numberOfTracks": profile.tracks,
+                "lastUpdated": "bench",
+            }
+            page = {
+                "playlist": info,
+                "items": items[offset : offset + limit],
+                "totalNumberOfItems": profile.tracks,
+            }
+            return 200, page, None
+        if path.startswith("/seg/"):
+            name = path.rsplit("/", 1)[1]
+            if name.startswith("init"):
+                body = self._init
+            else:
+                body = self._segments[(int(name.split(".")[0]) - 1) % profile.segments]
+            self.count("segments")
+            self.count("audio_bytes", len(body))
+            return 200, body, "video/mp4"
+        if path.startswith("/images/"):
+            return 200, b"\xff\xd8\xff\xe0" + b"\0" * 20000, "image/jpeg"
+        # 歌词 (含 LRCLIB) 一律未找到
+        return 404, {"detail": "not found"}, None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                profile = server.profile
+                server.count("requests")
+                time.sleep(profile.latency)
+
+                is_cover = url.path.startswith("/images/")
+                if not is_cover and random.random() < profile.error_rate:
+                    server.count("errors")
+                    return self._send(random.choice([429, 500, 503]), {})
+                if (
+                    url.path.startswith("/seg/")
+                    and random.random() < profile.stall_rate
+                ):
+                    server.count("stalls")
+                    time.sleep(profile.stall_seconds)
+
+                status, body, content_type = server.route(url.path, parse_qs(url.query))
+                self._send(status, body, content_type)
+
+            def _send(self, status, body, content_type=None):
+                if not isinstance(body, bytes):
+                    body = json.dumps(body).encode()
+                    content_type = "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command == "HEAD":
+                    return
+                rate = server.profile.bandwidth_mb * 1024 * 1024
+                if rate <= 0:
+                    self.wfile.write(body)
+                    return
+                # 按每个连接的带宽分块发送
+                for i in range(0, len(body), _WRITE_CHUNK):
+                    chunk = body[i : i + _WRITE_CHUNK]
+                    self.wfile.write(chunk)
+                    time.sleep(len(chunk) / rate)
+
+        return Handler
+
+
+def serve(
+    port: int = typer.Option(0, help="监听端口，0 表示自动分配"),
+    tracks: int = typer.Option(20, help="专辑/歌单的曲目数"),
+    segments: int = typer.Option(20, help="每首歌的分段数"),
+    segment_kb: int = typer.Option(64, help="每个分段的大小 (KB)"),
+    latency: float = typer.Option(0.02, help="每个请求的固定延迟 (秒)"),
+    bandwidth_mb: float = typer.Option(0.0, help="每个连接的带宽 (MB/s)，0 表示不限"),
+    error_rate: float = typer.Option(0.0, help="返回 429/5xx 的概率"),
+    stall_rate: float = typer.Option(0.0, help="分段请求卡住的概率"),
+    stall_seconds: float = typer.Option(5.0, help="卡住的时长 (秒)"),
+):
+    """启动模拟服务器，直到标准输入关闭或进程被结束"""
+    profile = BenchProfile(
+        tracks,
+        segments,
+        segment_kb,
+        latency,
+        bandwidth_mb,
+        error_rate,
+        stall_rate,
+        stall_seconds,
+    )
+    server = MockTidalServer(profile, port).start()
+    print(json.dumps({"url": server.url}), flush=True)
+    try:
+        # 父进程通过标准输入请求统计数据，关闭标准输入即退出
+        while True:
+            line = input()
+            if line.strip() == "stats":
+                print(json.dumps(server.stats), flush=True)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    typer.run(serve)
@@ -25,4 +25,4 @@ def handle_command(base_url, command, value):
         )
         album_dir.mkdir(exist_ok=True)
         for track in data["tracks"]:
-            downloader.process_track(track["id"], album_dir)
+            downloader.process_track(track["id"], album_dir, track)
@@ -27,26 +27,89 @@ audio:
 
 network:
   # API 服务器列表
-  # 程序会随机选择其中一个
+  # 程序会根据延迟与失败率为每个服务器评分，每次请求都选择最健康的一个
   api_urls:
     - "https://tidal.kinoplus.online"
     - "https://api.tidalhifi.com"
-  # DASH 分段下载并发数
+  # 服务器连续失败多少次后暂时停用 (熔断)
+  mirror_failure_threshold: 3
+  # 停用后多少秒开始后台探测，探测成功才重新启用 (秒，失败后逐次翻倍)
+  mirror_cooldown: 30
+  # 对冲请求：主服务器超过近期耗时分位数仍未响应时，向次优服务器发同样的请求，
+  # 取先返回的结果 (会略微增加请求量)
+  hedge_requests: False
+  # 触发对冲的耗时分位数 (0~1)
+  hedge_percentile: 0.9
+  # 每个服务器 (API 镜像、音频 CDN 分别计算) 的初始并发数
   concurrency: 10
+  # 自适应并发：吞吐提升时逐步加并发，遇到 429/5xx/超时时减半 (True/False)
+  # 关闭时每个服务器的并发固定为 concurrency
+  adaptive_concurrency: True
+  # 自适应并发的下限与上限
+  concurrency_min: 2
+  concurrency_max: 32
+  # 获取长歌单/专辑时同时请求的分页数
+  page_concurrency: 4
+  # 专辑/歌单下载时同时下载的歌曲数 (元数据获取与封装在独立的流水线阶段中进行)
+  track_concurrency: 3
+  # 单曲重排窗口 (分段数)，决定每首歌最多在内存中暂存多少个未落盘分段
+  reorder_window: 32
+  # 掉队分段对冲：某个分段明显慢于本曲已完成分段的中位数时，在新连接上重新请求，
+  # 取先完成的一份 (True/False)
+  straggler_hedging: True
+  # 耗时超过中位数的多少倍 (且速率低于中位数的几分之一) 判定为掉队
+  straggler_factor: 3
+  # 下载带宽上限 (MB/s，所有连接共享)，0 表示不限
+  max_bandwidth_mb: 0
+  # 每个 API 服务器每秒最多发出的请求数，0 表示不限 (音频 CDN 不受此限制)
+  # 主动匀速发请求，比触发服务器限流 (429) 后再退避更快
+  requests_per_second: 0
+  # 直链文件按 Range 分块并发下载时的块大小 (MB)
+  range_chunk_mb: 4
   # 请求超时时间 (秒)
   timeout: 30
-  # 失败重试次数
+  # 单个请求失败后的最多重试次数 (指数退避 + 随机抖动)
   max_retries: 3
+  # 单个请求含所有重试在内的最长耗时 (秒)
+  request_deadline: 60
+  # 每次运行允许的重试总次数，防止大面积故障时请求量成倍放大
+  retry_budget: 500
+  # 同一音质下载失败多少次后才降到下一档音质 (每次重试都从断点继续)
+  track_failure_threshold: 3
+
+cache:
+  # 在配置文件所在目录的 streamfetch.db 中缓存 API 元数据 (True/False)
+  enabled: True
+  # 离线模式：只从缓存回答元数据请求，不访问网络 (也可用 sf --offline)
+  offline: False
+  # 各接口缓存有效期 (小时)，0 表示不缓存
+  info_ttl_hours: 168
+  album_ttl_hours: 24
+  playlist_ttl_hours: 1
+  search_ttl_hours: 6
+  # 封面缓存 (covers/ 目录) 的容量上限 (MB)，超出时删除最久未使用的封面
+  cover_max_mb: 200
 
 lyrics:
   # 是否保存为外部 .lrc 文件 (True/False)
   save_lrc: False
+  # 歌词缓存有效期 (天)
+  cache_days: 90
+  # "未找到歌词" 的缓存有效期 (天)，期间不再重复查询
+  miss_cache_days: 7
 
 ffmpeg:
   # FFmpeg 可执行文件路径
   # 如果已添加到系统环境变量，直接填 "ffmpeg" 
   # 否则填绝对路径，例如: "C:/Tools/ffmpeg/bin/ffmpeg.exe"
   binary: "ffmpeg"
+  # FLAC 音频使用内置封装器，不启动 FFmpeg 进程 (AAC/HIGH 音质仍使用 FFmpeg)
+  native_flac: True
+  # 同时进行封装的歌曲数，0 表示跟随 CPU 核数
+  workers: 0
+  # 管道模式：DASH 分段按序直接写入 ffmpeg 标准输入，一次生成最终文件，
+  # 不再落地临时音频文件 (直链或断点续传时仍使用临时文件；不支持断点续传)
+  pipe_input: False
 
 naming:
   file_format: "{Artist}/{Album}/{Title}"
@@ -67,12 +130,44 @@ INTERNAL_DEFAULTS = {
     "audio": {"max_quality": "HIRES_LOSSLESS", "auto_fallback": True},
     "network": {
         "api_urls": ["https://tidal.kinoplus.online"],
+        "mirror_failure_threshold": 3,
+        "mirror_cooldown": 30,
+        "hedge_requests": False,
+        "hedge_percentile": 0.9,
         "concurrency": 16,
+        "adaptive_concurrency": True,
+        "concurrency_min": 2,
+        "concurrency_max": 32,
+        "page_concurrency": 4,
+        "track_concurrency": 3,
+        "reorder_window": 32,
+        "straggler_hedging": True,
+        "straggler_factor": 3,
+        "max_bandwidth_mb": 0,
+        "requests_per_second": 0,
+        "range_chunk_mb": 4,
         "timeout": 30,
         "max_retries": 3,
+        "request_deadline": 60,
+        "retry_budget": 500,
+        "track_failure_threshold": 3,
+    },
+    "cache": {
+        "enabled": True,
+        "offline": False,
+        "info_ttl_hours": 168,
+        "album_ttl_hours": 24,
+        "playlist_ttl_hours": 1,
+        "search_ttl_hours": 6,
+        "cover_max_mb": 200,
+    },
+    "lyrics": {"save_lrc": False, "cache_days": 90, "miss_cache_days": 7},
+    "ffmpeg": {
+        "binary": "ffmpeg",
+        "native_flac": True,
+        "workers": 0,
+        "pipe_input": False,
     },
-    "lyrics": {"save_lrc": False},
-    "ffmpeg": {"binary": "ffmpeg"},
     "naming": {"file_format": "{Artist}/{Album}/{Title}"},
 }
 
@@ -86,6 +181,10 @@ def get_config_path() -> Path:
     
     return config_path
 
+def get_app_dir() -> Path:
+    """应用数据目录 (与 config.yml 同目录)，用于存放缓存数据库等"""
+    return get_config_path().parent
+
 def ensure_config_exists(config_path: Path):
     """
     如果配置文件不存在，则创建默认配置
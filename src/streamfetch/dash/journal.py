@@ -0,0 +1,148 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("streamfetch")
+
+PARTIAL_DIR_NAME = ".partial"
+
+
+class DownloadJournal:
+    """
+    单曲断点续传日志
+    与确定性的部分文件 (<track_id>_<quality>.part) 放在同一目录，记录 manifest、
+    manifest 结构哈希，以及已完成的分段数 (DASH) 或字节区间 (直链)。
+    """
+
+    SAVE_INTERVAL = 1.0
+
+    def __init__(self, partial_dir: Path, track_id, quality: str):
+        stem = f"{track_id}_{quality}"
+        self.path = Path(partial_dir) / f"{stem}.json"
+        self.data_path = Path(partial_dir) / f"{stem}.part"
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        self.state = {
+            "trackId": str(track_id),
+            "quality": quality,
+            "manifestHash": None,
+            "manifest": None,
+            "kind": None,
+            "total": 0,
+            "segments": 0,
+            "bytes": 0,
+            "ranges": [],
+        }
+
+    @classmethod
+    def open(cls, partial_dir: Path, track_id, quality: str) -> "DownloadJournal":
+        """读取已有日志，不存在或损坏时返回空日志"""
+        journal = cls(partial_dir, track_id, quality)
+        if journal.path.exists():
+            try:
+                with open(journal.path, "r", encoding="utf-8") as f:
+                    journal.state.update(json.load(f))
+            except Exception as e:
+                logger.debug(f"断点日志损坏，重新下载: {e}")
+        return journal
+
+    @staticmethod
+    def manifest_hash(urls: List[str]) -> str:
+        """只对 URL 路径取哈希，忽略会过期的签名参数"""
+        stable = [urlsplit(u)._replace(query="", fragment="").geturl() for u in urls]
+        return hashlib.sha1("\n".join(stable).encode("utf-8")).hexdigest()
+
+    @property
+    def manifest(self) -> Optional[str]:
+        return self.state["manifest"]
+
+    @property
+    def segments(self) -> int:
+        return self.state["segments"]
+
+    @property
+    def bytes(self) -> int:
+        return self.state["bytes"]
+
+    @property
+    def ranges(self) -> List[List[int]]:
+        return self.state["ranges"]
+
+    def matches(self, manifest_hash: str, kind: str, total: int) -> bool:
+        """部分文件与当前 manifest 对应同一份数据时才能续传"""
+        if (
+            self.state["manifestHash"] != manifest_hash
+            or self.state["kind"] != kind
+            or self.state["total"] != total
+            or not self.data_path.exists()
+        ):
+            return False
+        return self.data_path.stat().st_size >= self.state["bytes"]
+
+    def reset(self, manifest_hash: str, kind: str, total: int):
+        """开始一次全新的下载，保留当前 manifest"""
+        self.state.update(
+            {
+                "manifestHash": manifest_hash,
+                "kind": kind,
+                "total": total,
+                "segments": 0,
+                "bytes": 0,
+                "ranges": [],
+            }
+        )
+        self.save(force=True)
+
+    def update_manifest(self, manifest: str):
+        """记录新获取的 manifest (如签名 URL 过期后刷新)，已完成进度不变"""
+        self.state["manifest"] = manifest
+        self.save(force=True)
+
+    def mark_segments(self, segments: int, nbytes: int):
+        with self._lock:
+            self.state["segments"] = segments
+            self.state["bytes"] = nbytes
+        self.save()
+
+    def mark_range(self, start: int, end: int):
+        with self._lock:
+            self.state["ranges"].append([start, end])
+        self.save()
+
+    def save(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_save < self.SAVE_INTERVAL:
+                return
+            self._last_save = now
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def discard_track(partial_dir: Path, track_id):
+        """
+        歌曲完成后删除该曲目所有音质的部分文件与日志
+        目录由同批次的其他歌曲共用，不在这里删除，见 remove_partial_dir
+        """
+        partial_dir = Path(partial_dir)
+        if not partial_dir.exists():
+            return
+        for p in partial_dir.glob(f"{track_id}_*"):
+            p.unlink(missing_ok=True)
+
+    @staticmethod
+    def remove_partial_dir(partial_dir: Path):
+        """整批下载结束后删除空的部分文件目录，仍有未完成的歌曲时保留"""
+        try:
+            Path(partial_dir).rmdir()
+        except OSError:
+            pass
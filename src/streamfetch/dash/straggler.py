@@ -0,0 +1,168 @@
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from typing import Optional
+
+from streamfetch.utils.adaptive import adaptive_controller
+from streamfetch.utils.http import fetch_get, host_slot, iter_body
+
+logger = logging.getLogger("streamfetch")
+
+_STREAM_CHUNK = 64 * 1024
+
+# 每个分段最多同时有原请求与一个副本
+_transfer_executor = ThreadPoolExecutor(
+    max_workers=adaptive_controller.maximum * 2, thread_name_prefix="sf-transfer"
+)
+
+
+class SegmentAbandoned(Exception):
+    """另一份请求已先完成，本请求被放弃"""
+
+
+class _Transfer:
+    """一次分段请求的实时进度，供看门狗判断是否掉队"""
+
+    def __init__(self):
+        # 拿到并发名额、真正发出请求时才开始计时
+        self.started: Optional[float] = None
+        self.received = 0
+        self.abandoned = False
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self) -> float:
+        return self.received / max(1e-6, self.elapsed)
+
+
+class SegmentStats:
+    """单曲内已完成分段的耗时与速率，用于计算运行中位数"""
+
+    MIN_SAMPLES = 5
+
+    def __init__(self, size: int = 64):
+        self._lock = threading.Lock()
+        self._elapsed = deque(maxlen=size)
+        self._rates = deque(maxlen=size)
+
+    def record(self, transfer: _Transfer):
+        with self._lock:
+            self._elapsed.append(transfer.elapsed)
+            self._rates.append(transfer.rate)
+
+    def medians(self):
+        """返回 (耗时中位数, 速率中位数)，样本不足时返回 None"""
+        with self._lock:
+            if len(self._elapsed) < self.MIN_SAMPLES:
+                return None
+            return statistics.median(self._elapsed), statistics.median(self._rates)
+
+
+class StragglerGuard:
+    """
+    掉队分段的看门狗
+    分段耗时超过已完成分段中位数的 factor 倍、且速率低于中位数的 1/factor 时判定为掉队，
+    在新连接上发起同样的请求，取先完成的一份，另一份随即放弃。
+    """
+
+    # 中位数很小时的最短等待 (秒)，避免对正常的抖动发副本
+    MIN_DELAY = 1.0
+
+    def __init__(self, factor: float = 3.0, enabled: bool = True):
+        self.factor = max(1.0, factor)
+        self.enabled = enabled
+        self.stats = SegmentStats()
+
+    def fetch(self, url: str, timeout=None, fresh=False) -> bytes:
+        """fresh=True 时首个请求也使用新连接 (用于失败后的重试)"""
+        primary_transfer = _Transfer()
+        primary = _transfer_executor.submit(
+            _fetch_segment, url, timeout, primary_transfer, fresh
+        )
+        if not self.enabled:
+            return self._finish(primary, primary_transfer)
+
+        while True:
+            delay = self._check_delay(primary_transfer)
+            done, _ = wait([primary], timeout=delay)
+            if done:
+                return self._finish(primary, primary_transfer)
+            if self._is_straggler(primary_transfer):
+                break
+
+        logger.debug(
+            f"🐢 分段 {primary_transfer.elapsed:.1f}s 未完成 "
+            f"({primary_transfer.received} 字节)，在新连接上重新请求"
+        )
+        backup_transfer = _Transfer()
+        backup = _transfer_executor.submit(
+            _fetch_segment, url, timeout, backup_transfer, True
+        )
+        transfers = {primary: primary_transfer, backup: backup_transfer}
+        first_error = None
+        for future in as_completed(transfers):
+            try:
+                data = future.result()
+            except Exception as e:
+                first_error = first_error or e
+                continue
+            for other, transfer in transfers.items():
+                if other is not future:
+                    transfer.abandoned = True
+                    other.cancel()
+            self.stats.record(transfers[future])
+            return data
+        raise first_error
+
+    def _finish(self, future, transfer: _Transfer) -> bytes:
+        data = future.result()
+        self.stats.record(transfer)
+        return data
+
+    def _check_delay(self, transfer: _Transfer) -> float:
+        """下一次检查前的等待时间；样本不足时每隔 MIN_DELAY 检查一次"""
+        medians = self.stats.medians()
+        if medians is None:
+            return self.MIN_DELAY
+        threshold = max(self.MIN_DELAY, medians[0] * self.factor)
+        remaining = threshold - transfer.elapsed
+        # 超过阈值后按阈值的 1/4 间隔复查速率
+        return remaining if remaining > 0 else threshold / 4
+
+    def _is_straggler(self, transfer: _Transfer) -> bool:
+        medians = self.stats.medians()
+        if medians is None:
+            return False
+        median_elapsed, median_rate = medians
+        return (
+            transfer.elapsed > max(self.MIN_DELAY, median_elapsed * self.factor)
+            and transfer.rate < median_rate / self.factor
+        )
+
+
+def _fetch_segment(url: str, timeout, transfer: _Transfer, fresh: bool) -> bytes:
+    """流式读取分段，边读边更新进度；被放弃时尽快断开连接"""
+    with host_slot(url) as slot:
+        if transfer.abandoned:
+            raise SegmentAbandoned("分段已由另一请求完成")
+        transfer.started = time.monotonic()
+        resp = fetch_get(url, stream=True, timeout=timeout, fresh=fresh)
+        try:
+            buf = bytearray()
+            for piece in iter_body(resp, _STREAM_CHUNK):
+                if transfer.abandoned:
+                    raise SegmentAbandoned("分段已由另一请求完成")
+                buf += piece
+                transfer.received += len(piece)
+        finally:
+            resp.close()
+        slot["bytes"] = len(buf)
+    return bytes(buf)
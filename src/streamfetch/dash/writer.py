@@ -0,0 +1,56 @@
+import threading
+from typing import BinaryIO, Callable, Dict, Optional
+
+
+class SegmentWriter:
+    """
+    按序流式写入 DASH 分段
+    分段可以乱序到达，先暂存在重排窗口中，一旦下一个连续序号就绪立即落盘。
+    提交下载前需调用 acquire() 占用窗口名额，名额在分段写入磁盘后才释放，
+    因此单曲内存占用为 O(window)，而不是 O(整首歌)。
+    start 为续传时已落盘的分段数；on_flush(written, nbytes) 在数据刷入文件后回调。
+    """
+
+    def __init__(
+        self,
+        outfile: BinaryIO,
+        window: int,
+        start: int = 0,
+        on_flush: Optional[Callable[[int, int], None]] = None,
+    ):
+        self._outfile = outfile
+        self._slots = threading.Semaphore(max(1, window))
+        self._lock = threading.Lock()
+        self._pending: Dict[int, bytes] = {}
+        self._next = start
+        self._on_flush = on_flush
+        self.error: Optional[BaseException] = None
+
+    @property
+    def written(self) -> int:
+        """已连续写入磁盘的分段数"""
+        return self._next
+
+    def acquire(self):
+        """占用一个窗口名额，窗口已满时阻塞，从而对提交方形成背压"""
+        self._slots.acquire()
+
+    def put(self, index: int, data: bytes):
+        with self._lock:
+            self._pending[index] = data
+            flushed = False
+            while self._next in self._pending:
+                self._outfile.write(self._pending.pop(self._next))
+                self._next += 1
+                self._slots.release()
+                flushed = True
+            if flushed and self._on_flush is not None:
+                self._outfile.flush()
+                self._on_flush(self._next, self._outfile.tell())
+
+    def abort(self, error: BaseException):
+        """分段失败时调用：记录错误并归还名额，唤醒可能阻塞的提交方"""
+        with self._lock:
+            if self.error is None:
+                self.error = error
+        self._slots.release()
@@ -5,11 +5,13 @@ from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 
-from streamfetch.config.api_targets import get_base_url
 from streamfetch.tidal.api import TidalApi
 from streamfetch.tidal.downloader import TidalDownloader
+from streamfetch.tidal.mirrors import mirror_pool
+from streamfetch.tidal.sync import PlaylistSync
 from streamfetch.cli.interactive import interactive_search
 from streamfetch.config.settings import config
+from streamfetch.utils.library import library_index
 from streamfetch.utils.logging_config import logger
 
 console = Console()
@@ -18,10 +20,25 @@ app = typer.Typer(
     add_completion=False,
     rich_markup_mode="rich",
 )
+library_app = typer.Typer(help="📚 本地曲库索引", add_completion=False)
+app.add_typer(library_app, name="library")
+
+@app.callback()
+def main(
+    offline: bool = typer.Option(
+        False, "--offline", help="离线模式：只使用本地缓存的元数据，不访问 API"
+    ),
+):
+    """StreamFetch - 一个音乐下载工具"""
+    if offline:
+        config["cache"]["offline"] = True
+
 
 def get_context():
     """初始化 API、下载器及基础目录"""
-    base_url = get_base_url()
+    # 从镜像池中选出当前健康评分最好的服务器
+    base_url = mirror_pool.best()
+    logger.debug(f"🚀 选中服务器: {base_url}")
     api = TidalApi(base_url)
     downloader = TidalDownloader(api)
 
@@ -69,24 +86,68 @@ def playlist(link_or_id: str = typer.Argument(..., help="歌单链接 或 UUID")
     playlist_id = extract_id(link_or_id)
 
     try:
-        data = api.get_playlist(playlist_id)
-        info, tracks = data["info"], data["tracks"]
+        info, first = api.get_playlist_head(playlist_id)
+        count = info.get("numberOfTracks")
 
-        if not tracks:
+        if count == 0:
             console.print("[bold red]❌ 歌单为空[/bold red]")
             return
 
         # 展示歌单预览
         table = Table(title="🎵 歌单确认", show_header=False, box=None)
         table.add_row("[bold cyan]标题:[/bold cyan]", info.get("title", "Unknown"))
-        table.add_row("[bold cyan]歌曲数:[/bold cyan]", f"[green]{len(tracks)}[/green]")
+        table.add_row(
+            "[bold cyan]歌曲数:[/bold cyan]",
+            f"[green]{count if count is not None else '?'}[/green]",
+        )
         console.print(Panel(table, expand=False, border_style="cyan"))
 
         if typer.confirm("❓ 确认下载吗?"):
-            downloader.download_playlist(tracks, download_dir)
-            
+            # 逐页获取曲目，第一页到达即开始下载
+            downloader.download_playlist(
+                api.iter_playlist(playlist_id, first=first), download_dir
+            )
+
     except Exception as e:
         logger.error(f"处理歌单失败: {e}")
 
+@app.command()
+def sync(
+    link_or_id: str = typer.Argument(..., help="歌单链接 或 UUID"),
+    prune: bool = typer.Option(
+        False, "--prune", help="删除已从歌单中移除、且由 sync 下载的歌曲 (其他已同步歌单仍包含的除外)"
+    ),
+    m3u: bool = typer.Option(False, "--m3u", help="在下载目录写出 .m3u8 播放列表"),
+):
+    """🔁 增量同步歌单 (只下载新增的歌曲)"""
+    api, downloader, download_dir = get_context()
+    try:
+        PlaylistSync(api, downloader).run(
+            extract_id(link_or_id), download_dir, prune=prune, m3u=m3u
+        )
+    except Exception as e:
+        logger.error(f"同步歌单失败: {e}")
+
+@library_app.command("rebuild")
+def library_rebuild(
+    path: Path = typer.Argument(None, help="要扫描的目录 (默认为下载目录)"),
+):
+    """
+    🔄 扫描已下载的文件，重建曲库索引
+
+    只能识别 streamfetch 下载时内嵌了 TIDAL_TRACK_ID 标签的 FLAC 文件；
+    其他工具下载或标签被改写的文件不会被收录，再次下载时不会跳过。
+    """
+    root = path or Path(config["general"]["download_dir"])
+    if not root.is_absolute():
+        root = Path.cwd() / root
+    if not root.exists():
+        console.print(f"[bold red]❌ 目录不存在: {root}[/bold red]")
+        return
+
+    with console.status(f"[bold green]Scanning {root}..."):
+        count = library_index.rebuild(root)
+    console.print(f"[bold green]✅ 已收录 {count} 首歌曲[/bold green]")
+
 if __name__ == "__main__":
     app()
\ No newline at end of file
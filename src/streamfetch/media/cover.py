@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Optional
+
+from streamfetch.config.settings import config, get_app_dir
+from streamfetch.utils.http import fetch_get
+from streamfetch.utils.retry import retry_policy
+
+logger = logging.getLogger("streamfetch")
+
+COVER_URL = "https://resources.tidal.com/images/{path}/1280x1280.jpg"
+
+
+class CoverCache:
+    """
+    以 coverId 为键的封面缓存
+    - 本次运行内：记住每个封面的本地路径，同一专辑只处理一次；
+      下载失败不会被记住，之后的歌曲会重新尝试
+    - 跨运行：保存在应用目录的 covers/ 下，超过 cache.cover_max_mb 时按最近使用时间淘汰
+    - 多首歌同时请求同一封面时只下载一次，其余等待同一个结果
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._results: Dict[str, Future] = {}
+
+    def _path(self, cover_id: str) -> Path:
+        return self.cache_dir / f"{cover_id}.jpg"
+
+    def get(self, cover_id: str) -> Optional[Path]:
+        """返回封面文件路径，下载失败时返回 None"""
+        if not cover_id:
+            return None
+        with self._lock:
+            future = self._results.get(cover_id)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._results[cover_id] = future
+
+        if owner:
+            try:
+                path = self._load(cover_id)
+            except Exception as e:
+                logger.debug(f"封面下载失败 ({cover_id}): {e}")
+                path = None
+            if path is None:
+                # 正在等待的歌曲得到 None，之后的请求重新下载
+                with self._lock:
+                    if self._results.get(cover_id) is future:
+                        del self._results[cover_id]
+            future.set_result(path)
+        return future.result()
+
+    def _load(self, cover_id: str) -> Optional[Path]:
+        path = self._path(cover_id)
+        if path.exists() and path.stat().st_size > 0:
+            # 更新访问时间，作为 LRU 淘汰依据
+            os.utime(path)
+            return path
+        if config["cache"]["offline"]:
+            return None
+
+        url = COVER_URL.format(path=cover_id.replace("-", "/"))
+        resp = retry_policy.call(lambda timeout: fetch_get(url, timeout=timeout))
+        if not resp.content:
+            return None
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(resp.content)
+        os.replace(tmp_path, path)
+        self._evict()
+        return path
+
+    def _evict(self):
+        """总大小超过上限时，从最久未使用的封面开始删除 (本次运行用到的除外)"""
+        try:
+            files = [(p, p.stat()) for p in self.cache_dir.glob("*.jpg")]
+        except OSError:
+            return
+        total = sum(st.st_size for _, st in files)
+        if total <= self.max_bytes:
+            return
+
+        with self._lock:
+            in_use = {self._path(cover_id) for cover_id in self._results}
+        for p, st in sorted(files, key=lambda item: item[1].st_mtime):
+            if total <= self.max_bytes:
+                break
+            if p in in_use:
+                continue
+            try:
+                p.unlink()
+                total -= st.st_size
+            except OSError:
+                pass
+
+
+cover_cache = CoverCache(
+    get_app_dir() / "covers", int(config["cache"]["cover_max_mb"] * 1024 * 1024)
+)
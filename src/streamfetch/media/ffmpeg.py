@@ -2,14 +2,15 @@ import subprocess
 import logging
 import os
 from streamfetch.config.settings import config
+from streamfetch.media.flac import TRACK_ID_TAG
 
 logger = logging.getLogger("streamfetch")
 
 
-def embed_metadata(audio_path, cover_path, lyrics_path, metadata, final_path):
+def _build_args(audio_input, cover_path, lyrics_path, metadata, final_path):
     ffmpeg_bin = config["ffmpeg"]["binary"]
 
-    args = [ffmpeg_bin, "-i", str(audio_path)]
+    args = [ffmpeg_bin, "-i", str(audio_input)]
 
     has_cover = False
     if cover_path and os.path.exists(cover_path) and os.path.getsize(cover_path) > 0:
@@ -36,6 +37,8 @@ def embed_metadata(audio_path, cover_path, lyrics_path, metadata, final_path):
             "comment=Downloaded by StreamFetch",
         ]
     )
+    if metadata.get("id"):
+        args.extend(["-metadata", f"{TRACK_ID_TAG}={metadata['id']}"])
 
     # 嵌入歌词
     if lyrics_path and os.path.exists(lyrics_path):
@@ -49,6 +52,12 @@ def embed_metadata(audio_path, cover_path, lyrics_path, metadata, final_path):
     # 输出文件参数
     # -c:a copy 表示音频流不重新编码（无损直通）
     args.extend(["-c:a", "copy", "-y", "-loglevel", "error", str(final_path)])
+    return args
+
+
+def embed_metadata(audio_path, cover_path, lyrics_path, metadata, final_path):
+    args = _build_args(audio_path, cover_path, lyrics_path, metadata, final_path)
+    ffmpeg_bin = args[0]
 
     try:
         subprocess.run(args, check=True)
@@ -58,3 +67,45 @@ def embed_metadata(audio_path, cover_path, lyrics_path, metadata, final_path):
     except subprocess.CalledProcessError as e:
         logger.error(f"FFmpeg 混流失败: {e}")
         raise
+
+
+class PipeMuxer:
+    """
+    边下载边封装：按序到达的音频字节直接写入 ffmpeg 标准输入 (-i pipe:0)，
+    一次写出最终文件，不再落地临时音频文件。仅适用于无需回读的流式容器 (DASH fMP4)。
+    """
+
+    def __init__(self, cover_path, lyrics_path, metadata, final_path):
+        self.final_path = final_path
+        args = _build_args("pipe:0", cover_path, lyrics_path, metadata, final_path)
+        try:
+            self._proc = subprocess.Popen(args, stdin=subprocess.PIPE)
+        except FileNotFoundError:
+            logger.error(f"找不到 FFmpeg，请检查配置文件中的路径: {args[0]}")
+            raise
+
+    def write(self, data):
+        self._proc.stdin.write(data)
+
+    def flush(self):
+        self._proc.stdin.flush()
+
+    def close(self):
+        """输入结束，等待 ffmpeg 写完文件"""
+        self._proc.stdin.close()
+        code = self._proc.wait()
+        if code != 0:
+            raise subprocess.CalledProcessError(code, self._proc.args)
+
+    def abort(self):
+        """下载失败时终止 ffmpeg 并删除不完整的输出"""
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        self._proc.kill()
+        self._proc.wait()
+        try:
+            os.remove(self.final_path)
+        except OSError:
+            pass
@@ -0,0 +1,463 @@
+import logging
+import os
+import struct
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("streamfetch")
+
+# FLAC 元数据块类型
+STREAMINFO = 0
+VORBIS_COMMENT = 4
+PICTURE = 6
+
+# 单个元数据块的长度上限 (24 位)
+MAX_BLOCK_SIZE = (1 << 24) - 1
+
+# 写入文件的 Tidal 曲目 ID 标签，用于重建曲库索引
+TRACK_ID_TAG = "TIDAL_TRACK_ID"
+
+
+class RemuxError(Exception):
+    """fMP4 数据无法被内置封装器处理"""
+
+
+class UnsupportedCodec(RemuxError):
+    """音频流不是 FLAC (例如 HIGH 音质的 AAC)，需要交给 FFmpeg"""
+
+
+def _iter_boxes(
+    data, start: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[str, int, int]]:
+    """遍历 [start, end) 内的 MP4 盒子，产出 (类型, 内容起点, 盒子终点)"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise RemuxError("MP4 盒子长度无效")
+        yield kind.decode("latin-1"), pos + header, pos + size
+        pos += size
+
+
+def _find(data, path: List[str], start: int = 0, end: Optional[int] = None):
+    """按路径查找第一个匹配的盒子，返回 (内容起点, 盒子终点)"""
+    for kind, body, box_end in _iter_boxes(data, start, end):
+        if kind != path[0]:
+            continue
+        if len(path) == 1:
+            return body, box_end
+        found = _find(data, path[1:], body, box_end)
+        if found:
+            return found
+    return None
+
+
+def _block(kind: int, payload: bytes, last: bool = False) -> bytes:
+    return (
+        bytes([(0x80 if last else 0) | kind])
+        + len(payload).to_bytes(3, "big")
+        + payload
+    )
+
+
+def _vorbis_comment(tags: List[Tuple[str, str]]) -> bytes:
+    vendor = b"StreamFetch"
+    out = [struct.pack("<I", len(vendor)), vendor, struct.pack("<I", len(tags))]
+    for key, value in tags:
+        entry = f"{key}={value}".encode("utf-8")
+        out.append(struct.pack("<I", len(entry)))
+        out.append(entry)
+    return b"".join(out)
+
+
+def _image_info(data: bytes) -> Tuple[str, int, int, int]:
+    """返回 (MIME, 宽, 高, 色深)，无法识别时尺寸为 0"""
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 26:
+        width, height, bits, color = struct.unpack_from(">IIBB", data, 16)
+        channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}.get(color, 1)
+        return "image/png", width, height, bits * channels
+
+    pos = 2
+    while pos + 9 < len(data):
+        if data[pos] != 0xFF:
+            break
+        marker = data[pos + 1]
+        length = struct.unpack_from(">H", data, pos + 2)[0]
+        # SOF0 ~ SOF15 (不含 DHT/JPG/DAC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            precision, height, width, components = struct.unpack_from(
+                ">BHHB", data, pos + 4
+            )
+            return "image/jpeg", width, height, precision * components
+        pos += 2 + length
+    return "image/jpeg", 0, 0, 0
+
+
+def _picture(data: bytes) -> bytes:
+    mime, width, height, depth = _image_info(data)
+    mime_bytes = mime.encode("ascii")
+    return b"".join(
+        [
+            struct.pack(">II", 3, len(mime_bytes)),  # 3 = 封面
+            mime_bytes,
+            struct.pack(">I", 0),  # 描述为空
+            struct.pack(">IIIII", width, height, depth, 0, len(data)),
+            data,
+        ]
+    )
+
+
+class FlacRemuxer:
+    """
+    内置的 fMP4 -> FLAC 封装器，无需启动 FFmpeg
+    以流的方式接收 DASH 分段字节：moov 中取出 dfLa 的 STREAMINFO 写入文件头
+    (附带 Vorbis 注释与封面)，随后每个 moof/mdat 中的 FLAC 帧原样追加。
+    接口与 PipeMuxer 一致，可直接作为分段写入目标。
+    """
+
+    def __init__(self, cover_path, lyrics_path, metadata, final_path):
+        self.final_path = str(final_path)
+        self.codec: Optional[str] = None
+        self._tmp_path = f"{self.final_path}.tmp"
+        self._tags = self._build_tags(lyrics_path, metadata)
+        self._cover = self._read_cover(cover_path)
+
+        self._buf = bytearray()
+        self._offset = 0  # _buf[0] 在整个输入流中的位置
+        self._out = None
+        self._streaminfo = None
+        self._track_id = None
+        self._timescale = None
+        self._sample_rate = None
+        self._default_duration = 0
+        self._default_size = 0
+        self._samples: List[Tuple[int, int]] = []  # 待写入的 (流内位置, 长度)
+        self._total_samples = 0
+        self._min_frame = 0
+        self._max_frame = 0
+
+    @staticmethod
+    def _build_tags(lyrics_path, metadata) -> List[Tuple[str, str]]:
+        tags = [
+            ("TITLE", metadata["title"]),
+            ("ARTIST", metadata["artist"]),
+            ("ALBUM", metadata["album"]),
+            ("TRACKNUMBER", str(metadata["trackNumber"])),
+            ("COMMENT", "Downloaded by StreamFetch"),
+        ]
+        if metadata.get("id"):
+            tags.append((TRACK_ID_TAG, str(metadata["id"])))
+        if lyrics_path and os.path.exists(lyrics_path):
+            try:
+                with open(lyrics_path, "r", encoding="utf-8") as f:
+                    tags.append(("LYRICS", f.read()))
+            except Exception as e:
+                logger.warning(f"读取歌词失败: {e}")
+        return tags
+
+    @staticmethod
+    def _read_cover(cover_path) -> Optional[bytes]:
+        if not cover_path or not os.path.exists(cover_path):
+            return None
+        with open(cover_path, "rb") as f:
+            data = f.read()
+        return data or None
+
+    def write(self, data):
+        self._buf += data
+        while len(self._buf) >= 8:
+            size, kind = struct.unpack_from(">I4s", self._buf, 0)
+            if size == 1:
+                if len(self._buf) < 16:
+                    return
+                size = struct.unpack_from(">Q", self._buf, 8)[0]
+            elif size == 0:
+                # 延伸到流末尾的盒子，等 close() 时处理
+                return
+            if size < 8:
+                raise RemuxError("MP4 盒子长度无效")
+            if len(self._buf) < size:
+                return
+            self._handle(kind.decode("latin-1"), bytes(self._buf[:size]))
+            del self._buf[:size]
+            self._offset += size
+
+    def flush(self):
+        if self._out is not None:
+            self._out.flush()
+
+    def _handle(self, kind: str, box: bytes):
+        # 截断或损坏的盒子在解析时会越界，统一转为 RemuxError 以便回退到 FFmpeg
+        try:
+            self._dispatch(kind, box)
+        except (struct.error, IndexError, ValueError) as e:
+            raise RemuxError(f"MP4 数据损坏: {e}") from e
+
+    def _dispatch(self, kind: str, box: bytes):
+        if kind == "moov":
+            self._parse_moov(box)
+        elif kind == "moof":
+            if self._out is None:
+                raise RemuxError("在 moov 之前出现了 moof")
+            self._parse_moof(box)
+        elif kind == "mdat":
+            if self._out is None:
+                raise RemuxError("在 moov 之前出现了 mdat")
+            self._write_frames(box)
+
+    def _parse_moov(self, box: bytes):
+        stsd = _find(box, ["moov", "trak", "mdia", "minf", "stbl", "stsd"])
+        if not stsd:
+            raise RemuxError("moov 中缺少 stsd")
+        # FullBox 头 4 字节 + entry_count 4 字节
+        entries = list(_iter_boxes(box, stsd[0] + 8, stsd[1]))
+        if not entries:
+            raise RemuxError("stsd 为空")
+        self.codec, entry_body, entry_end = entries[0]
+        if self.codec != "fLaC":
+            raise UnsupportedCodec(f"不支持的音频编码: {self.codec}")
+
+        # AudioSampleEntry 固定字段 28 字节之后是子盒子
+        dfla = _find(box, ["dfLa"], entry_body + 28, entry_end)
+        if not dfla:
+            raise RemuxError("fLaC 中缺少 dfLa")
+        pos = dfla[0] + 4
+        while pos + 4 <= dfla[1]:
+            header = box[pos]
+            length = int.from_bytes(box[pos + 1 : pos + 4], "big")
+            if header & 0x7F == STREAMINFO and length == 34:
+                self._streaminfo = bytearray(box[pos + 4 : pos + 4 + length])
+                break
+            if header & 0x80:
+                break
+            pos += 4 + length
+        if self._streaminfo is None:
+            raise RemuxError("dfLa 中缺少 STREAMINFO")
+        self._sample_rate = int.from_bytes(self._streaminfo[10:13], "big") >> 4
+
+        mdhd = _find(box, ["moov", "trak", "mdia", "mdhd"])
+        if mdhd:
+            version = box[mdhd[0]]
+            at = mdhd[0] + (20 if version == 1 else 12)
+            self._timescale = struct.unpack_from(">I", box, at)[0]
+        trex = _find(box, ["moov", "mvex", "trex"])
+        if trex:
+            (
+                self._track_id,
+                _,
+                self._default_duration,
+                self._default_size,
+            ) = struct.unpack_from(">IIII", box, trex[0] + 4)
+
+        self._write_header()
+
+    def _write_header(self):
+        blocks = [(STREAMINFO, bytes(self._streaminfo))]
+        blocks.append((VORBIS_COMMENT, _vorbis_comment(self._tags)))
+        if self._cover:
+            picture = _picture(self._cover)
+            if len(picture) <= MAX_BLOCK_SIZE:
+                blocks.append((PICTURE, picture))
+            else:
+                logger.warning("封面过大，无法嵌入 FLAC")
+
+        self._out = open(self._tmp_path, "wb")
+        self._out.write(b"fLaC")
+        for i, (kind, payload) in enumerate(blocks):
+            self._out.write(_block(kind, payload, last=i == len(blocks) - 1))
+
+    def _parse_moof(self, box: bytes):
+        moof_start = self._offset
+        for kind, body, end in _iter_boxes(box, 8):
+            if kind != "traf":
+                continue
+            tfhd = _find(box, ["tfhd"], body, end)
+            if not tfhd:
+                continue
+            flags = int.from_bytes(box[tfhd[0] + 1 : tfhd[0] + 4], "big")
+            pos = tfhd[0] + 4
+            track_id = struct.unpack_from(">I", box, pos)[0]
+            pos += 4
+            if self._track_id is not None and track_id != self._track_id:
+                continue
+
+            base = moof_start
+            duration = self._default_duration
+            size = self._default_size
+            if flags & 0x01:
+                base = struct.unpack_from(">Q", box, pos)[0]
+                pos += 8
+            if flags & 0x02:
+                pos += 4
+            if flags & 0x08:
+                duration = struct.unpack_from(">I", box, pos)[0]
+                pos += 4
+            if flags & 0x10:
+                size = struct.unpack_from(">I", box, pos)[0]
+                pos += 4
+
+            for tkind, tbody, tend in _iter_boxes(box, body, end):
+                if tkind == "trun":
+                    self._parse_trun(box, tbody, base, duration, size)
+
+    def _parse_trun(self, box: bytes, pos: int, base: int, duration: int, size: int):
+        flags = int.from_bytes(box[pos + 1 : pos + 4], "big")
+        count = struct.unpack_from(">I", box, pos + 4)[0]
+        pos += 8
+        offset = None
+        if flags & 0x01:
+            offset = base + struct.unpack_from(">i", box, pos)[0]
+            pos += 4
+        if flags & 0x04:
+            pos += 4
+
+        for _ in range(count):
+            sample_duration = duration
+            sample_size = size
+            if flags & 0x100:
+                sample_duration = struct.unpack_from(">I", box, pos)[0]
+                pos += 4
+            if flags & 0x200:
+                sample_size = struct.unpack_from(">I", box, pos)[0]
+                pos += 4
+            if flags & 0x400:
+                pos += 4
+            if flags & 0x800:
+                pos += 4
+            # offset 为 None 表示紧接在下一个 mdat 的内容开头
+            self._samples.append((offset, sample_size))
+            if offset is not None:
+                offset += sample_size
+            self._total_samples += sample_duration
+
+    def _write_frames(self, box: bytes):
+        header = 16 if struct.unpack_from(">I", box, 0)[0] == 1 else 8
+        mdat_start = self._offset
+        cursor = mdat_start + header
+        for offset, size in self._samples:
+            if offset is None:
+                offset = cursor
+            rel = offset - mdat_start
+            if rel < header or rel + size > len(box):
+                raise RemuxError("样本位置超出 mdat 范围")
+            self._out.write(box[rel : rel + size])
+            cursor = offset + size
+            self._min_frame = min(self._min_frame or size, size)
+            self._max_frame = max(self._max_frame, size)
+        self._samples = []
+
+    def _patch_streaminfo(self):
+        """补全 fMP4 中通常为 0 的总采样数与帧长范围"""
+        info = self._streaminfo
+        if (
+            self._timescale
+            and self._sample_rate
+            and self._timescale != self._sample_rate
+        ):
+            total = self._total_samples * self._sample_rate // self._timescale
+        else:
+            total = self._total_samples
+        packed = int.from_bytes(info[10:18], "big")
+        if total and packed & ((1 << 36) - 1) == 0:
+            packed |= total & ((1 << 36) - 1)
+            info[10:18] = packed.to_bytes(8, "big")
+        if self._min_frame and int.from_bytes(info[4:7], "big") == 0:
+            info[4:7] = self._min_frame.to_bytes(3, "big")
+        if self._max_frame and int.from_bytes(info[7:10], "big") == 0:
+            info[7:10] = self._max_frame.to_bytes(3, "big")
+        # "fLaC" + 块头 4 字节之后就是 STREAMINFO
+        self._out.seek(8)
+        self._out.write(info)
+
+    def close(self):
+        """输入结束，补全文件头并原子地替换为最终文件"""
+        if self._buf:
+            size = (
+                struct.unpack_from(">I", self._buf, 0)[0] if len(self._buf) >= 8 else -1
+            )
+            if size != 0:
+                raise RemuxError("音频数据不完整")
+            self._handle(bytes(self._buf[4:8]).decode("latin-1"), bytes(self._buf))
+            self._buf.clear()
+        if self._out is None:
+            raise RemuxError("音频数据中缺少 moov")
+        try:
+            self._patch_streaminfo()
+        finally:
+            self._out.close()
+        os.replace(self._tmp_path, self.final_path)
+
+    def abort(self):
+        if self._out is not None:
+            self._out.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+def remux_file(
+    audio_path, cover_path, lyrics_path, metadata, final_path, chunk_size=1 << 20
+):
+    """把已下载的 fMP4 文件封装为 FLAC，音频不是 FLAC 时抛出 UnsupportedCodec"""
+    remuxer = FlacRemuxer(cover_path, lyrics_path, metadata, final_path)
+    try:
+        with open(audio_path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                remuxer.write(chunk)
+        remuxer.close()
+    except BaseException:
+        remuxer.abort()
+        raise
+
+
+def read_flac_info(path) -> Optional[dict]:
+    """
+    读取 FLAC 文件头中的 STREAMINFO 与 Vorbis 注释 (不读取音频帧)
+    返回 {"sampleRate", "bitsPerSample", "tags"}，不是有效 FLAC 时返回 None
+    """
+    info = {"sampleRate": 0, "bitsPerSample": 0, "tags": {}}
+    try:
+        with open(path, "rb") as f:
+            if f.read(4) != b"fLaC":
+                return None
+            while True:
+                header = f.read(4)
+                if len(header) < 4:
+                    break
+                kind = header[0] & 0x7F
+                length = int.from_bytes(header[1:4], "big")
+                if kind == STREAMINFO:
+                    packed = int.from_bytes(f.read(length)[10:18], "big")
+                    info["sampleRate"] = packed >> 44
+                    info["bitsPerSample"] = ((packed >> 36) & 0x1F) + 1
+                elif kind == VORBIS_COMMENT:
+                    data = f.read(length)
+                    pos = 4 + struct.unpack_from("<I", data, 0)[0]
+                    count = struct.unpack_from("<I", data, pos)[0]
+                    pos += 4
+                    for _ in range(count):
+                        size = struct.unpack_from("<I", data, pos)[0]
+                        entry = data[pos + 4 : pos + 4 + size].decode(
+                            "utf-8", "replace"
+                        )
+                        pos += 4 + size
+                        key, _, value = entry.partition("=")
+                        info["tags"].setdefault(key.upper(), value)
+                else:
+                    f.seek(length, os.SEEK_CUR)
+                if header[0] & 0x80:
+                    break
+    except (OSError, struct.error) as e:
+        logger.debug(f"读取 FLAC 标签失败 ({path}): {e}")
+        return None
+    return info
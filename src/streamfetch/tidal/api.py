@@ -1,30 +1,259 @@
 import base64
-import urllib.parse
 import logging
+import threading
 import time
-from streamfetch.utils.http import fetch_get
-from streamfetch.config.api_targets import get_base_url
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from streamfetch.utils.http import HttpError, fetch_get
+from streamfetch.utils.retry import InvalidResponse, retry_policy
+from streamfetch.utils.cache import (
+    LyricsCache,
+    OfflineCacheMiss,
+    lyrics_cache,
+    metadata_cache,
+)
+from streamfetch.tidal.mirrors import mirror_pool
+from streamfetch.config.settings import config
 
 logger = logging.getLogger("streamfetch")
 
+# 对冲请求使用的线程池；落败的请求无法中途打断，会继续占用线程直到完成或超时
+HEDGE_WORKERS = 32
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=HEDGE_WORKERS, thread_name_prefix="sf-hedge"
+)
+# 已占用的线程数；只在有空闲线程时提交，请求永远不会排在落败的请求后面
+_hedge_busy = 0
+_hedge_lock = threading.Lock()
+
+
+def _reserve_hedge_slots(n: int) -> bool:
+    global _hedge_busy
+    with _hedge_lock:
+        if _hedge_busy + n > HEDGE_WORKERS:
+            return False
+        _hedge_busy += n
+        return True
+
+
+def _release_hedge_slot():
+    global _hedge_busy
+    with _hedge_lock:
+        _hedge_busy -= 1
+
+# 列表接口每页条数
+PAGE_SIZE = 100
+
+# 分页并发请求使用的线程池
+_page_executor = ThreadPoolExecutor(
+    max_workers=config["network"]["page_concurrency"], thread_name_prefix="sf-page"
+)
+
+# compact_track 保留的曲目字段 (album/artist/mediaMetadata 单独处理)
+_TRACK_FIELDS = (
+    "id",
+    "title",
+    "version",
+    "trackNumber",
+    "duration",
+    "audioQuality",
+    "explicit",
+    "streamStartDate",
+    "releaseDate",
+    "cover",
+    "type",
+)
+
+
+def has_full_metadata(info) -> bool:
+    """专辑/歌单中的曲目对象是否已包含下载所需的全部字段"""
+    album = info.get("album") or {}
+    if "{Year}" in config["naming"]["file_format"] and not (
+        info.get("streamStartDate") or info.get("releaseDate")
+    ):
+        return False
+    return bool(
+        info.get("id")
+        and info.get("title")
+        and (info.get("artist") or info.get("artists"))
+        and album.get("title")
+        and album.get("cover")
+        and info.get("trackNumber") is not None
+        and info.get("audioQuality")
+        and info.get("duration") is not None
+    )
+
+
+def compact_track(info) -> dict:
+    """只保留下载与展示需要的字段，长歌单逐页处理时内存占用保持平稳"""
+    record = {key: info[key] for key in _TRACK_FIELDS if key in info}
+    album = info.get("album") or {}
+    record["album"] = {k: album[k] for k in ("id", "title", "cover") if k in album}
+    if info.get("artist"):
+        record["artist"] = {"name": info["artist"].get("name")}
+    if info.get("artists"):
+        record["artists"] = [{"name": info["artists"][0].get("name")}]
+    tags = (info.get("mediaMetadata") or {}).get("tags")
+    if tags:
+        record["mediaMetadata"] = {"tags": list(tags)}
+    return record
+
+
+def normalize_track(info, track_id=None) -> dict:
+    """把 /info/、专辑、歌单接口返回的曲目对象统一整理为下载所需的元数据"""
+    base_quality = info.get("audioQuality", "LOSSLESS")
+    media_metadata = info.get("mediaMetadata", {})
+    tags = media_metadata.get("tags", [])
+
+    if "HIRES_LOSSLESS" in tags:
+        effective_quality = "HI_RES"
+    elif "MQA" in tags:
+        effective_quality = "HI_RES"
+    else:
+        effective_quality = base_quality
+
+    date_str = info.get("streamStartDate") or info.get("releaseDate")
+    year = date_str.split("-")[0] if date_str else "Unknown"
+    is_explicit = info.get("explicit", False)
+    explicit_tag = "E" if is_explicit else ""
+
+    return {
+        "id": info.get("id", track_id),
+        "title": info.get("title", "Unknown Title"),
+        "album": info.get("album", {}).get("title", "Unknown Album"),
+        "albumId": info.get("album", {}).get("id"),
+        "artist": info.get("artist", {}).get("name")
+        or info.get("artists", [{}])[0].get("name")
+        or "Unknown Artist",
+        "trackNumber": info.get("trackNumber", 1),
+        "coverId": info.get("album", {}).get("cover") or info.get("cover"),
+        "audioQuality": effective_quality,
+        "year": year,
+        "explicit": explicit_tag,
+        "duration": info.get("duration", 0),
+    }
 
-class TidalApi:
-    def __init__(self, base_url):
-        self.base_url = base_url
 
-    def _switch_server(self):
-        old_url = self.base_url
-        for _ in range(3):
-            new_url = get_base_url()
-            if new_url != old_url:
-                self.base_url = new_url
-                break
+class TidalApi:
+    def __init__(self, base_url=None):
+        # 最近一次请求使用的服务器，实际路由由镜像池决定
+        self.base_url = base_url or mirror_pool.best()
 
+    def _switch_server(self, error=None, kind=None):
+        # 失败已反馈给镜像池，下一次请求会自动路由到评分更好的服务器
         logger.warning(
             f"⚠️ 服务器异常，切换至下一个服务器",
             extra={"markup": True},
         )
 
+    def _call(self, func):
+        """按统一重试策略执行一次 API 调用，func 接收单次尝试的超时时间"""
+        return retry_policy.call(func, on_retry=self._switch_server)
+
+    def _cached_json(self, path, params=None, validate=None, fresh=False):
+        """
+        带持久化缓存的 API 调用：命中且未过期直接返回，否则请求后写入缓存
+        validate 用于在写入缓存前校验响应；fresh 为 True 时跳过缓存读取；
+        离线模式下只读缓存
+        """
+        cached = None
+        if not fresh or metadata_cache.offline:
+            cached = metadata_cache.get(path, params)
+        if cached is not None:
+            logger.debug(f"💾 缓存命中: {path} {params}")
+            return cached
+
+        def fetch(timeout):
+            data = self._get_json(path, params, timeout)
+            if validate is not None:
+                validate(data)
+            return data
+
+        data = self._call(fetch)
+        metadata_cache.put(path, params, data)
+        return data
+
+    def _get_json(self, path, params=None, timeout=None):
+        """
+        向当前最健康的镜像发起请求
+        开启对冲时，若主镜像在近期耗时分位数内未响应，则向次优镜像发同样的请求，
+        取先返回的结果。
+        """
+        if metadata_cache.offline:
+            raise OfflineCacheMiss(f"离线模式：缓存中没有 {path} {params}")
+        if config["network"]["hedge_requests"]:
+            delay = mirror_pool.latency_percentile(
+                config["network"]["hedge_percentile"], path
+            )
+            ranked = mirror_pool.ranked()
+            if delay is not None and len(ranked) > 1:
+                return self._hedged_get_json(
+                    path, params, ranked[:2], delay, timeout
+                )
+        return self._request_json(mirror_pool.best(), path, params, timeout)
+
+    def _hedged_get_json(self, path, params, mirrors, delay, timeout=None):
+        """
+        主镜像超过 delay 未响应时向次优镜像发起同样的请求，返回先成功的结果
+        落后的请求无法中断，只是被放弃：它在 _hedge_executor 中跑完
+        (最长不超过请求超时)，结果照常反馈给镜像池后丢弃。
+        线程池被这些请求占满时不再对冲，直接在当前线程请求，不会排队等待。
+        """
+        # 主请求与可能的对冲请求的线程一起预留，对冲时一定有空闲线程
+        if not _reserve_hedge_slots(2):
+            return self._request_json(mirrors[0], path, params, timeout)
+        primary = self._submit_hedged(mirrors[0], path, params, timeout)
+        try:
+            done, _ = wait([primary], timeout=delay)
+        except BaseException:
+            _release_hedge_slot()
+            raise
+        if done:
+            _release_hedge_slot()
+            return primary.result()
+
+        backup = self._submit_hedged(mirrors[1], path, params, timeout)
+        logger.debug(f"⏱️ {path} 超过 {delay:.2f}s 未响应，向 {mirrors[1]} 发起对冲请求")
+        first_error = None
+        for future in as_completed([primary, backup]):
+            try:
+                return future.result()
+            except Exception as e:
+                first_error = first_error or e
+        raise first_error
+
+    def _submit_hedged(self, base_url, path, params, timeout):
+        """在已预留的线程上发起请求，完成 (或超时) 后归还该线程"""
+
+        def run():
+            try:
+                return self._request_json(base_url, path, params, timeout)
+            finally:
+                _release_hedge_slot()
+
+        return _hedge_executor.submit(run)
+
+    def _request_json(self, base_url, path, params=None, timeout=None):
+        """请求单个镜像，并把耗时与失败反馈给镜像池"""
+        self.base_url = base_url
+        start = time.monotonic()
+        try:
+            data = fetch_get(
+                f"{base_url}{path}", params=params, timeout=timeout
+            ).json()
+        except HttpError as e:
+            # 404 表示资源不存在 (如该音质不可用)，服务器本身是正常的
+            if e.status == 404:
+                mirror_pool.report_success(base_url, time.monotonic() - start, path)
+            else:
+                mirror_pool.report_failure(base_url)
+            raise
+        except Exception:
+            mirror_pool.report_failure(base_url)
+            raise
+        mirror_pool.report_success(base_url, time.monotonic() - start, path)
+        return data
+
     def _find_items_array(self, obj):
         if not obj or not isinstance(obj, (dict, list)):
             return None
@@ -118,272 +347,289 @@ class TidalApi:
                 extra={"markup": True},
             )
 
-        max_retries = 6
+        def search(q):
+            return self._find_items_array(
+                self._cached_json(
+                    "/search/", {"s": q, "limit": 25, "countryCode": "WW"}
+                )
+            )
 
-        for attempt in range(max_retries):
-            try:
-                url = f"{self.base_url}/search/?s={
-                    urllib.parse.quote(search_query)
-                }&limit=25&countryCode=WW"
+        try:
+            raw_items = search(search_query)
+            if not raw_items and match_parts:
+                logger.debug("组合搜索未命中，尝试原始关键词...")
+                raw_items = search(query)
+        except Exception as e:
+            logger.error(f"❌ 搜索最终失败: {e}")
+            return []
+
+        if not raw_items:
+            return []
+
+        results = []
+        for item in raw_items:
+            t = item.get("item", item)
+            if not t or not t.get("title"):
+                continue
+
+            title = t.get("title")
+            version = t.get("version")
+            if version:
+                title = f"{title} ({version})"
+
+            base_quality = t.get("audioQuality", "Unknown")
+            tags = t.get("mediaMetadata", {}).get("tags", [])
+            if "HIRES_LOSSLESS" in tags or "MQA" in tags:
+                display_quality = "HI_RES"
+            else:
+                display_quality = base_quality
+
+            artists_list = t.get("artists", [])
+            if artists_list:
+                artist_names = [a.get("name") for a in artists_list if a.get("name")]
+                artist_name = ", ".join(artist_names)
+            else:
+                artist_name = t.get("artist", {}).get("name", "Unknown")
+
+            results.append(
+                {
+                    "id": str(t.get("id")),
+                    "title": title,
+                    "artist": artist_name,
+                    "album": t.get("album", {}).get("title", "Unknown Album"),
+                    "quality": display_quality,
+                }
+            )
 
-                resp = fetch_get(url)
-                data = resp.json()
+        if match_parts and len(match_parts) == 2 and results:
+            part_a = match_parts[0]
+            part_b = match_parts[1]
 
-                raw_items = self._find_items_array(data)
+            high_priority = []
+            normal_priority = []
 
-                if not raw_items:
-                    if attempt == 0 and match_parts:
-                        logger.debug("组合搜索未命中，尝试原始关键词...")
-                        search_query = query
-                        continue
-                    return []
+            for item in results:
+                r_title = item["title"].lower()
 
-                results = []
-                for item in raw_items:
-                    t = item.get("item", item)
-                    if not t or not t.get("title"):
-                        continue
+                r_artist = item["artist"].lower()
 
-                    title = t.get("title")
-                    version = t.get("version")
-                    if version:
-                        title = f"{title} ({version})"
-
-                    base_quality = t.get("audioQuality", "Unknown")
-                    tags = t.get("mediaMetadata", {}).get("tags", [])
-                    if "HIRES_LOSSLESS" in tags or "MQA" in tags:
-                        display_quality = "HI_RES"
-                    else:
-                        display_quality = base_quality
-
-                    artists_list = t.get("artists", [])
-                    if artists_list:
-                        artist_names = [
-                            a.get("name") for a in artists_list if a.get("name")
-                        ]
-                        artist_name = ", ".join(artist_names)
-                    else:
-                        artist_name = t.get("artist", {}).get("name", "Unknown")
-
-                    results.append(
-                        {
-                            "id": str(t.get("id")),
-                            "title": title,
-                            "artist": artist_name,
-                            "album": t.get("album", {}).get("title", "Unknown Album"),
-                            "quality": display_quality,
-                        }
-                    )
-
-                if match_parts and len(match_parts) == 2 and results:
-                    part_a = match_parts[0]
-                    part_b = match_parts[1]
-
-                    high_priority = []
-                    normal_priority = []
-
-                    for item in results:
-                        r_title = item["title"].lower()
-
-                        r_artist = item["artist"].lower()
-
-                        match_1 = (part_a in r_title) and (part_b in r_artist)
-                        match_2 = (part_b in r_title) and (part_a in r_artist)
-
-                        if match_1 or match_2:
-                            high_priority.append(item)
-                        else:
-                            normal_priority.append(item)
-
-                    if high_priority:
-                        logger.info(
-                            f"✨ 精确匹配到 {len(high_priority)} 个结果，已置顶"
-                        )
-                        return high_priority + normal_priority
-
-                return results
+                match_1 = (part_a in r_title) and (part_b in r_artist)
+                match_2 = (part_b in r_title) and (part_a in r_artist)
 
-            except Exception as e:
-                is_last_attempt = attempt == max_retries - 1
-                if is_last_attempt:
-                    logger.error(f"❌ 搜索最终失败: {e}")
-                    return []
-                self._switch_server()
-                time.sleep(0.5)
+                if match_1 or match_2:
+                    high_priority.append(item)
+                else:
+                    normal_priority.append(item)
 
-        return []
+            if high_priority:
+                logger.info(f"✨ 精确匹配到 {len(high_priority)} 个结果，已置顶")
+                return high_priority + normal_priority
+
+        return results
 
     def get_metadata(self, track_id):
         logger.debug(f"📡 [1/6] Getting metadata (ID: {track_id})...")
 
-        max_retries = 6
-        for attempt in range(max_retries):
-            try:
-                resp = fetch_get(f"{self.base_url}/info/?id={track_id}").json()
-                info = resp.get("data", resp)
+        def validate(resp):
+            info = resp.get("data", resp)
+            if not info or "title" not in info:
+                raise InvalidResponse("Invalid metadata response")
 
-                if not info or "title" not in info:
-                    raise Exception("Invalid metadata response")
+        resp = self._cached_json("/info/", {"id": track_id}, validate)
+        info = resp.get("data", resp)
 
-                base_quality = info.get("audioQuality", "LOSSLESS")
-                media_metadata = info.get("mediaMetadata", {})
-                tags = media_metadata.get("tags", [])
+        return normalize_track(info, track_id)
 
-                if "HIRES_LOSSLESS" in tags:
-                    effective_quality = "HI_RES"
-                elif "MQA" in tags:
-                    effective_quality = "HI_RES"
-                else:
-                    effective_quality = base_quality
-
-                date_str = info.get("streamStartDate") or info.get("releaseDate")
-                year = date_str.split("-")[0] if date_str else "Unknown"
-                is_explicit = info.get("explicit", False)
-                explicit_tag = "E" if is_explicit else ""
-
-                return {
-                    "title": info.get("title", "Unknown Title"),
-                    "album": info.get("album", {}).get("title", "Unknown Album"),
-                    "artist": info.get("artist", {}).get("name")
-                    or info.get("artists", [{}])[0].get("name")
-                    or "Unknown Artist",
-                    "trackNumber": info.get("trackNumber", 1),
-                    "coverId": info.get("album", {}).get("cover") or info.get("cover"),
-                    "audioQuality": effective_quality,
-                    "year": year,
-                    "explicit": explicit_tag,
-                    "duration": info.get("duration", 0),
-                }
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                self._switch_server()
-                time.sleep(0.5)
+    def resolve_metadata(self, track):
+        """
+        使用专辑/歌单接口已返回的曲目对象构造元数据
+        缺少必要字段时才退回 /info/ 单独请求
+        """
+        if has_full_metadata(track):
+            return normalize_track(track)
+        return self.get_metadata(track["id"])
 
     def get_lyrics(self, track_id):
         logger.debug(f"📝 [2/6] Getting lyrics...")
+        cache_key = LyricsCache.track_key(track_id)
+        hit, lyrics = lyrics_cache.get(cache_key)
+        if hit:
+            return lyrics
+
         try:
-            resp = fetch_get(f"{self.base_url}/lyrics/?id={track_id}")
-            data = resp.json()
-            result = self._extract_actual_lyrics(data)
-            if result:
-                text, is_sync = result
-                return {"text": text, "isLrc": is_sync}
+            data = self._get_json("/lyrics/", {"id": track_id})
+        except HttpError as e:
+            # 404 明确表示没有歌词，可以负缓存；其他错误下次再试
+            if e.status == 404:
+                lyrics_cache.put(cache_key, None)
+            return None
         except Exception:
-            pass
-        return None
+            return None
+
+        lyrics = None
+        result = self._extract_actual_lyrics(data)
+        if result:
+            text, is_sync = result
+            lyrics = {"text": text, "isLrc": is_sync}
+        lyrics_cache.put(cache_key, lyrics)
+        return lyrics
 
     def get_stream_manifest(self, track_id, quality):
         logger.debug(f"🌐 [3/6] Getting manifest ({quality})...")
 
-        max_retries = 6
-        for attempt in range(max_retries):
-            try:
-                data = fetch_get(
-                    f"{self.base_url}/track/?id={track_id}&quality={quality}"
-                ).json()
-                container = data.get("data", data)
-                manifest_b64 = container.get("manifest") or container.get(
-                    "info", {}
-                ).get("manifest")
-                if not manifest_b64:
-                    raise Exception("API returned no manifest")
-
-                return base64.b64decode(manifest_b64).decode("utf-8")
-
-            except Exception as e:
-                if "404" in str(e) and attempt >= 2:
-                    raise e
+        def fetch(timeout):
+            data = self._get_json(
+                "/track/", {"id": track_id, "quality": quality}, timeout
+            )
+            container = data.get("data", data)
+            manifest_b64 = container.get("manifest") or container.get(
+                "info", {}
+            ).get("manifest")
+            if not manifest_b64:
+                raise InvalidResponse("API returned no manifest")
+            return base64.b64decode(manifest_b64).decode("utf-8")
+
+        return self._call(fetch)
+
+    def _iter_pages(self, path, params, first=None, total_hint=None, fresh=False):
+        """
+        按偏移顺序逐页产出分页接口的原始响应
+        先取第一页读出总数，后续页通过镜像池并发预取 (最多领先 page_concurrency 页)，
+        每一页独立重试；总数未知时退回逐页请求，直到某页不满为止
+        """
+        limit = PAGE_SIZE
+
+        def fetch(offset):
+            return self._cached_json(
+                path, {**params, "offset": offset, "limit": limit}, fresh=fresh
+            )
 
-                if attempt == max_retries - 1:
-                    raise e
+        if first is None:
+            first = fetch(0)
+        yield first
+        total = first.get("totalNumberOfItems") or total_hint
+        if not total:
+            page = first
+            offset = 0
+            while len(self._find_items_array(page) or []) >= limit:
+                offset += limit
+                page = fetch(offset)
+                yield page
+            return
+
+        offsets = iter(range(limit, total, limit))
+        pending = deque()
+        try:
+            for offset in offsets:
+                pending.append(_page_executor.submit(fetch, offset))
+                if len(pending) >= config["network"]["page_concurrency"]:
+                    break
+            while pending:
+                page = pending.popleft().result()
+                offset = next(offsets, None)
+                if offset is not None:
+                    pending.append(_page_executor.submit(fetch, offset))
+                yield page
+        finally:
+            # 调用方提前停止迭代时丢弃尚未开始的预取
+            for future in pending:
+                future.cancel()
+
+    def get_album_info(self, album_id):
+        resp = self._cached_json("/album/", {"id": album_id})
+        return resp.get("data", resp)
+
+    def iter_album(self, album_id, album_info=None):
+        """逐页产出专辑曲目的精简记录"""
+        if album_info is None:
+            album_info = self.get_album_info(album_id)
+
+        raw_items = self._find_items_array(album_info) or []
+        # 专辑接口只内嵌部分曲目时，从 /album/items/ 分页取全
+        total = album_info.get("numberOfTracks")
+        if raw_items and not (total and len(raw_items) < total):
+            pages = [raw_items]
+        else:
+            pages = self._iter_pages(
+                "/album/items/", {"id": album_id}, total_hint=total
+            )
 
-                self._switch_server()
-                time.sleep(0.5)
+        for page in pages:
+            for item in self._find_items_array(page) or []:
+                t = item.get("item", item)
+                if t and t.get("id"):
+                    title = t.get("title")
+                    version = t.get("version")
+                    if version:
+                        t["title"] = f"{title} ({version})"
+                    yield compact_track(t)
 
     def get_album(self, album_id):
-        max_retries = 6
-        for attempt in range(max_retries):
-            try:
-                resp = fetch_get(f"{self.base_url}/album/?id={album_id}").json()
-
-                album_info = resp.get("data", resp)
-
-                raw_items = self._find_items_array(album_info)
-
-                if not raw_items:
-                    tracks_url = (
-                        f"{self.base_url}/album/items/?id={album_id}&limit=100&offset=0"
-                    )
-                    try:
-                        tracks_resp = fetch_get(tracks_url).json()
-                        raw_items = self._find_items_array(tracks_resp)
-                    except:
-                        pass
-
-                if not raw_items:
-                    raw_items = []
-
-    
-                clean_tracks = []
-                for item in raw_items:
-                    t = item.get("item", item)
-                    if t and t.get("id"):
-                        title = t.get("title")
-                        version = t.get("version")
-                        if version:
-                            t["title"] = f"{title} ({version})"
-                        clean_tracks.append(t)
-
-                return {"albumInfo": album_info, "tracks": clean_tracks}
-
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                self._switch_server()
-                time.sleep(0.5)
-
-    def get_playlist(self, playlist_uuid):
+        album_info = self.get_album_info(album_id)
+        try:
+            tracks = list(self.iter_album(album_id, album_info))
+        except Exception as e:
+            logger.warning(f"⚠️ 获取专辑曲目列表失败: {e}")
+            tracks = [
+                compact_track(item.get("item", item))
+                for item in self._find_items_array(album_info) or []
+            ]
+        return {"albumInfo": album_info, "tracks": tracks}
+
+    @staticmethod
+    def _playlist_info(resp):
+        return resp.get("playlist") or resp.get("data") or resp.get("info") or resp
+
+    def _playlist_first_page(self, playlist_uuid, fresh=False):
+        params = {
+            "id": playlist_uuid,
+            "countryCode": "WW",
+            "offset": 0,
+            "limit": PAGE_SIZE,
+        }
+        try:
+            return self._cached_json("/playlist/", params, fresh=fresh)
+        except Exception as e:
+            raise Exception(f"无法获取歌单信息: {e}")
+
+    def get_playlist_info(self, playlist_uuid, fresh=False):
+        """只请求第一页，返回歌单信息 (标题、曲目数、lastUpdated 等)"""
+        return self.get_playlist_head(playlist_uuid, fresh)[0]
+
+    def get_playlist_head(self, playlist_uuid, fresh=False):
+        """
+        只请求第一页，返回 (歌单信息, 第一页响应)
+        之后要列出曲目时把第一页作为 iter_playlist 的 first 传入，避免重复请求
+        """
+        first = self._playlist_first_page(playlist_uuid, fresh)
+        return self._playlist_info(first), first
+
+    def iter_playlist(self, playlist_uuid, fresh=False, first=None):
+        """
+        逐页产出歌单曲目的精简记录，第一页返回后即可开始下载
+        first 为调用方已取得的第一页响应，传入时不再重复请求
+        """
         logger.info(f"📋 Fetching playlist: {playlist_uuid}...", extra={"markup": True})
 
-        max_retries = 6
-        resp = None
-        base_api_url = None
-        params = {"id": playlist_uuid, "offset": 0, "limit": 100, "countryCode": "WW"}
-
-        for attempt in range(max_retries):
-            try:
-                base_api_url = f"{self.base_url}/playlist/"
-                resp = fetch_get(base_api_url, params=params).json()
-                break
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise Exception(f"无法获取歌单信息: {e}")
-                self._switch_server()
-                time.sleep(0.5)
-
-        info = resp.get("playlist") or resp.get("data") or resp.get("info") or resp
-        all_tracks = []
-
-        logger.info("   -> Loading tracks...", extra={"markup": True})
-
-        while True:
-            current_items = self._find_items_array(resp)
-            if not current_items:
-                break
-            for item in current_items:
-                if isinstance(item, dict) and item.get("type") == "video":
-                    continue
-                track = item.get("item", item)
-                if track and track.get("id") and track.get("title"):
-                    if track.get("type") == "VIDEO":
+        if first is None:
+            first = self._playlist_first_page(playlist_uuid, fresh)
+        info = self._playlist_info(first)
+        pages = self._iter_pages(
+            "/playlist/",
+            {"id": playlist_uuid, "countryCode": "WW"},
+            first=first,
+            total_hint=info.get("numberOfTracks"),
+            fresh=fresh,
+        )
+        try:
+            for page in pages:
+                for item in self._find_items_array(page) or []:
+                    if isinstance(item, dict) and item.get("type") == "video":
                         continue
-                    all_tracks.append(track)
-            if len(current_items) < params["limit"]:
-                break
-            params["offset"] += params["limit"]
-            try:
-                resp = fetch_get(base_api_url, params=params).json()
-            except Exception:
-                break
-        return {"info": info, "tracks": all_tracks}
+                    track = item.get("item", item)
+                    if track and track.get("id") and track.get("title"):
+                        if track.get("type") == "VIDEO":
+                            continue
+                        yield compact_track(track)
+        except Exception as e:
+            raise Exception(f"歌单曲目列表获取不完整: {e}")
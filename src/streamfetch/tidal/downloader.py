@@ -2,213 +2,743 @@ import os
 import random
 import string
 import logging
+import threading
 import time
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed, wait
 from streamfetch.utils.lrclib import LRCLib
 
-from rich.progress import (
-    Progress,
-    SpinnerColumn,
-    BarColumn,
-    TextColumn,
-    TimeRemainingColumn,
-    MofNCompleteColumn,
-)
 from streamfetch.utils.logging_config import console
-from streamfetch.utils.http import fetch_get
+from streamfetch.utils.http import HttpError
+from streamfetch.utils.retry import retry_policy
 from streamfetch.utils.filename import sanitize_filename, format_file_path
+from streamfetch.utils.library import library_index
 from streamfetch.dash.parser import DashParser
-from streamfetch.media.ffmpeg import embed_metadata
+from streamfetch.dash.writer import SegmentWriter
+from streamfetch.dash.straggler import StragglerGuard
+from streamfetch.dash.ranged import (
+    OffsetFileWriter,
+    RangeNotSupported,
+    fetch_range,
+    open_stream,
+    probe_content_length,
+    split_ranges,
+    write_stream,
+)
+from streamfetch.dash.journal import DownloadJournal, PARTIAL_DIR_NAME
+from streamfetch.media.ffmpeg import PipeMuxer, embed_metadata
+from streamfetch.media.flac import FlacRemuxer, RemuxError, remux_file
+from streamfetch.media.cover import cover_cache
 from streamfetch.config.settings import config
-from streamfetch.config.api_targets import get_base_url
+from streamfetch.tidal.scheduler import (
+    create_progress,
+    get_probe_pool,
+    get_segment_pool,
+    get_side_pool,
+)
+from streamfetch.tidal.pipeline import TrackPipeline
 
 logger = logging.getLogger("streamfetch")
 
 
+class ManifestExpired(Exception):
+    """CDN 签名链接已过期 (403/410)，需要重新获取 manifest"""
+
+
+def _raise_if_expired(e):
+    if isinstance(e, HttpError) and e.status in (403, 410):
+        raise ManifestExpired(f"分段链接已过期: {e}") from e
+
+
+class _SegmentUrls:
+    """
+    一首歌的分段 URL 列表
+    签名过期时由第一个发现的分段刷新 manifest，同时失败的其他分段直接使用新链接
+    """
+
+    def __init__(self, urls, refresh=None):
+        self.urls = urls
+        self.generation = 0
+        self.refreshable = refresh is not None
+        self._refresh = refresh
+        self._lock = threading.Lock()
+
+    def get(self, idx):
+        with self._lock:
+            return self.urls[idx], self.generation
+
+    def refresh(self, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            urls = self._refresh()
+            # 新 manifest 必须对应同一份数据，已写入的分段才能保留
+            if DownloadJournal.manifest_hash(urls) != DownloadJournal.manifest_hash(
+                self.urls
+            ):
+                raise Exception("刷新后的 manifest 与原分段不一致")
+            self.urls = urls
+            self.generation += 1
+            logger.debug("🔄 分段链接已过期，已刷新 manifest")
+
+
+class _TaskStatus:
+    """让共享进度面板中的任务拥有与 console.status 相同的 update 接口"""
+
+    def __init__(self, progress, task_id):
+        self.progress = progress
+        self.task_id = task_id
+
+    def update(self, text):
+        self.progress.update(self.task_id, description=text)
+
+
+class TrackJob:
+    """在流水线各阶段之间传递的单曲任务状态"""
+
+    def __init__(self, track_id, download_dir, record=None):
+        self.track_id = track_id
+        # 专辑/歌单接口已返回的曲目对象，字段齐全时无需再请求 /info/
+        self.record = record
+        self.download_dir = Path(download_dir)
+        self.partial_dir = self.download_dir / PARTIAL_DIR_NAME
+        self.meta = None
+        self.final_path = None
+        self.audio_path = None
+        self.quality = None
+        # 元数据就绪后立即开始获取的封面与歌词
+        self.cover_future = None
+        self.lyrics_future = None
+        self.extras = None
+        # 管道模式下音频已在下载阶段直接封装为最终文件
+        self.muxed = False
+
+
 class TidalDownloader:
+    # 单个分段因链接过期最多刷新 manifest 的次数
+    MAX_MANIFEST_REFRESHES = 2
+
     def __init__(self, api):
         self.api = api
+        # 批量下载时由 TrackPipeline 注入的共享进度面板
+        self.progress = None
+        # 专辑 ID -> 该专辑歌曲实际可用的音质
+        self._album_quality = {}
+        self._quality_lock = threading.Lock()
+
+    @contextmanager
+    def _progress_task(self, description, total):
+        if self.progress is not None:
+            task_id = self.progress.add_task(description, total=total)
+            try:
+                yield self.progress, task_id
+            finally:
+                self.progress.remove_task(task_id)
+        else:
+            with create_progress() as progress:
+                yield progress, progress.add_task(description, total=total)
+
+    @contextmanager
+    def _status(self, text):
+        if self.progress is not None:
+            task_id = self.progress.add_task(text, total=None)
+            try:
+                yield _TaskStatus(self.progress, task_id)
+            finally:
+                self.progress.remove_task(task_id)
+        else:
+            with console.status(text) as status:
+                yield status
 
-    def download_dash(self, manifest_xml, output_path):
+    def download_dash(
+        self,
+        manifest_xml,
+        output_path,
+        label="Downloading...",
+        journal=None,
+        refresh=None,
+    ):
+        """
+        下载 manifest 对应的音频流
+        传入 journal 时 output_path 应为 journal.data_path，已完成的部分会被跳过；
+        refresh 返回刷新后的分段 URL 列表，用于分段链接过期时原地续传
+        """
         parsed = DashParser.parse(manifest_xml)
         if not parsed:
             raise Exception("DASH Manifest 解析失败 (API 返回了无效数据)")
 
+        if parsed["type"] == "direct":
+            return self.download_direct(
+                parsed["url"], output_path, label=label, journal=journal
+            )
+
         urls = DashParser.build_urls(parsed)
         total_segments = len(urls)
         if total_segments == 0:
             raise Exception("解析出的分段列表为空")
 
-        downloaded_parts = {}
-        max_workers = config["network"]["concurrency"]
-
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[bold cyan]{task.description}"),
-            BarColumn(bar_width=30),
-            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-            "•",
-            MofNCompleteColumn(),
-            "•",
-            TimeRemainingColumn(),
-            transient=True,
-        ) as progress:
-            task_id = progress.add_task("⬇️  Downloading...", total=total_segments)
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_index = {
-                    executor.submit(lambda u: fetch_get(u).content, url): i
-                    for i, url in enumerate(urls)
-                }
+        start = 0
+        if journal is not None:
+            manifest_hash = DownloadJournal.manifest_hash(urls)
+            if journal.matches(manifest_hash, "dash", total_segments):
+                start = journal.segments
+            else:
+                journal.reset(manifest_hash, "dash", total_segments)
+        if start:
+            logger.info(
+                f"↩️  Resuming {label} ({start}/{total_segments} segments)",
+                extra={"markup": True},
+            )
+
+        with open(output_path, "r+b" if start else "wb") as outfile:
+            if start:
+                outfile.truncate(journal.bytes)
+                outfile.seek(journal.bytes)
+            self._write_segments(
+                urls, outfile, label, start=start, journal=journal, refresh=refresh
+            )
+
+    def _write_segments(
+        self, urls, outfile, label, start=0, journal=None, refresh=None
+    ):
+        """并发下载分段并按序写入 outfile (文件或 ffmpeg 的标准输入)"""
+        total_segments = len(urls)
+        segment_urls = _SegmentUrls(urls, refresh)
+        # 分段请求统一提交到全局线程池，多首歌同时下载时总并发依旧受限
+        executor = get_segment_pool()
+        window = config["network"]["reorder_window"]
+
+        with self._progress_task(f"⬇️  {label}", total_segments) as (
+            progress,
+            task_id,
+        ):
+            if start:
+                progress.advance(task_id, start)
+            writer = SegmentWriter(
+                outfile,
+                window,
+                start=start,
+                on_flush=journal.mark_segments if journal is not None else None,
+            )
+            # 以本曲已完成分段的耗时中位数为基准，为掉队的分段发副本请求
+            guard = StragglerGuard(
+                config["network"]["straggler_factor"],
+                enabled=config["network"]["straggler_hedging"],
+            )
+
+            def fetch_segment(idx):
+                try:
+                    data = self._fetch_segment(segment_urls, idx, guard)
+                    writer.put(idx, data)
+                except Exception as e:
+                    writer.abort(e)
+                    raise
+                progress.advance(task_id)
+
+            future_to_index = {}
+            try:
+                for i in range(start, total_segments):
+                    writer.acquire()
+                    if writer.error is not None:
+                        break
+                    future_to_index[executor.submit(fetch_segment, i)] = i
+
                 for future in as_completed(future_to_index):
                     idx = future_to_index[future]
                     try:
-                        data = future.result()
-                        downloaded_parts[idx] = data
-                        progress.advance(task_id)
+                        future.result()
                     except Exception as e:
+                        _raise_if_expired(e)
                         raise Exception(f"分段 {idx} 下载失败: {e}")
+            finally:
+                # 失败时撤销尚未开始的分段，并等待在途分段结束后再关闭文件
+                for future in future_to_index:
+                    future.cancel()
+                wait(future_to_index)
+                if journal is not None:
+                    journal.save(force=True)
 
-        with open(output_path, "wb") as outfile:
-            for i in range(total_segments):
-                outfile.write(downloaded_parts[i])
+            if writer.written != total_segments:
+                raise Exception(
+                    f"分段写入不完整 ({writer.written}/{total_segments})"
+                )
 
-    def process_track(self, track_id, download_dir):
-        """处理单首歌曲的完整流程"""
-        download_dir = Path(download_dir)
-        temp_id = "".join(random.choices(string.ascii_lowercase + string.digits, k=4))
-        temp_audio = download_dir / f"tmp_aud_{temp_id}.mp4"
-        temp_cover = download_dir / f"tmp_cov_{temp_id}.jpg"
-        temp_lyrics = download_dir / f"tmp_lyr_{temp_id}.txt"
+    def _fetch_segment(self, segment_urls, idx, guard):
+        """
+        下载单个分段，失败时只重试这一个分段
+        - 重试改用新连接，避开可能已经卡住的连接
+        - 链接过期 (403/410) 时刷新 manifest 后继续，已完成的分段不受影响
+        """
+        attempts = 0
+        refreshes = 0
+        while True:
+            url, generation = segment_urls.get(idx)
+
+            def attempt(timeout):
+                nonlocal attempts
+                attempts += 1
+                return guard.fetch(url, timeout=timeout, fresh=attempts > 1)
+
+            try:
+                return retry_policy.call(attempt)
+            except HttpError as e:
+                if (
+                    e.status not in (403, 410)
+                    or not segment_urls.refreshable
+                    or refreshes >= self.MAX_MANIFEST_REFRESHES
+                ):
+                    raise
+                refreshes += 1
+                segment_urls.refresh(generation)
 
+    def download_direct(
+        self, url, output_path, label="Downloading...", journal=None
+    ):
+        """直链文件：按 Range 分块并发下载，服务器忽略 Range 时退回单连接"""
+        chunk_size = int(config["network"]["range_chunk_mb"] * 1024 * 1024)
+        size = probe_content_length(url)
+        ranges = split_ranges(size, chunk_size) if size else []
+        manifest_hash = DownloadJournal.manifest_hash([url])
+
+        if len(ranges) > 1:
+            try:
+                self._download_ranges(
+                    url, ranges, size, output_path, label, journal, manifest_hash
+                )
+                return
+            except RangeNotSupported as e:
+                logger.debug(f"{e}，改用单连接下载")
+
+        # 先建立连接：链接过期时不破坏已有的部分文件
         try:
-            meta = self.api.get_metadata(track_id)
-            final_path = format_file_path(
-                config["naming"]["file_format"], meta, download_dir, extension=".flac"
+            resp = open_stream(url)
+        except Exception as e:
+            _raise_if_expired(e)
+            raise
+        if journal is not None:
+            # 单连接下载无法续传，始终从头开始
+            journal.reset(manifest_hash, "stream", 0)
+        with open(output_path, "wb") as outfile, self._progress_task(
+            f"⬇️  {label}", None
+        ):
+            write_stream(resp, outfile)
+
+    def _download_ranges(
+        self, url, ranges, size, output_path, label, journal, manifest_hash
+    ):
+        executor = get_segment_pool()
+
+        done = set()
+        if journal is not None:
+            if journal.matches(manifest_hash, "direct", size):
+                done = {tuple(r) for r in journal.ranges}
+            else:
+                journal.reset(manifest_hash, "direct", size)
+        pending = [r for r in ranges if r not in done]
+        if done:
+            logger.info(
+                f"↩️  Resuming {label} ({len(ranges) - len(pending)}/{len(ranges)} chunks)",
+                extra={"markup": True},
             )
 
-            if final_path.exists():
-                logger.info(
-                    f"⏭️  [dim]Skipped:[/dim] {meta['title']} (Exists)",
-                    extra={"markup": True},
+        with open(output_path, "r+b" if done else "wb") as outfile, self._progress_task(
+            f"⬇️  {label}", len(ranges)
+        ) as (progress, task_id):
+            progress.advance(task_id, len(ranges) - len(pending))
+            writer = OffsetFileWriter(outfile, size)
+
+            def fetch_chunk(start, end):
+                retry_policy.call(
+                    lambda timeout: fetch_range(url, start, end, writer, timeout)
                 )
-                return
+                if journal is not None:
+                    writer.flush()
+                    journal.mark_range(start, end)
 
-            # 获取流并下载
-            quality_map = {
-                "HI_RES": "HI_RES_LOSSLESS",
-                "LOSSLESS": "LOSSLESS",
-                "HIGH": "HIGH",
+            future_to_range = {
+                executor.submit(fetch_chunk, start, end): (start, end)
+                for start, end in pending
             }
-            priority = ["HI_RES", "LOSSLESS", "HIGH"]
+            try:
+                for future in as_completed(future_to_range):
+                    start, end = future_to_range[future]
+                    try:
+                        future.result()
+                        progress.advance(task_id)
+                    except RangeNotSupported:
+                        raise
+                    except Exception as e:
+                        _raise_if_expired(e)
+                        raise Exception(f"分块 {start}-{end} 下载失败: {e}")
+            finally:
+                # 撤销未开始的分块，并等待仍在写入的分块结束后再关闭文件
+                for future in future_to_range:
+                    future.cancel()
+                wait(future_to_range)
+                if journal is not None:
+                    journal.save(force=True)
+
+    def _download_with_journal(self, track_id, quality, journal, label):
+        """优先复用日志中的 manifest，只有 CDN 签名链接过期时才重新获取"""
+        refresh = partial(self._refresh_urls, track_id, quality, journal)
+        if journal.manifest:
+            try:
+                return self.download_dash(
+                    journal.manifest,
+                    journal.data_path,
+                    label=label,
+                    journal=journal,
+                    refresh=refresh,
+                )
+            except ManifestExpired as e:
+                logger.debug(f"{e}，重新获取 manifest")
+
+        manifest = self.api.get_stream_manifest(track_id, quality)
+        journal.update_manifest(manifest)
+        self.download_dash(
+            manifest, journal.data_path, label=label, journal=journal, refresh=refresh
+        )
+
+    def _refresh_urls(self, track_id, quality, journal=None):
+        """重新获取 manifest 并返回新的分段 URL 列表"""
+        manifest = self.api.get_stream_manifest(track_id, quality)
+        parsed = DashParser.parse(manifest)
+        if not parsed or parsed["type"] != "dash":
+            raise Exception("刷新后的 manifest 无效")
+        if journal is not None:
+            journal.update_manifest(manifest)
+        return DashParser.build_urls(parsed)
 
-            user_q = config["audio"]["max_quality"]
-            song_q = meta.get("audioQuality", "LOSSLESS")
-            start_idx = max(
-                priority.index(user_q) if user_q in priority else 0,
-                priority.index(song_q) if song_q in priority else 1,
+    def new_job(self, track_id, download_dir, record=None):
+        return TrackJob(track_id, download_dir, record)
+
+    def prepare_track(self, job):
+        """阶段一：获取元数据并确定输出路径，文件已存在时返回 None"""
+        file_format = config["naming"]["file_format"]
+        # 下载目录与命名格式都没变时，索引中的路径就是本次要写出的路径，
+        # 不产生任何 API 请求即可跳过；配置变化后才按元数据重新计算路径
+        indexed = library_index.lookup_in(job.track_id, job.download_dir, file_format)
+        if indexed is not None:
+            logger.info(
+                f"⏭️  [dim]Skipped:[/dim] {indexed.stem} (Indexed)",
+                extra={"markup": True},
             )
+            return None
 
-            qualities = (
-                priority[start_idx:]
-                if config["audio"]["auto_fallback"]
-                else [priority[start_idx]]
+        # 专辑/歌单的曲目对象自带完整元数据，这里通常不产生 API 请求
+        if job.record is not None:
+            job.meta = self.api.resolve_metadata(job.record)
+        else:
+            job.meta = self.api.get_metadata(job.track_id)
+        job.final_path = format_file_path(
+            file_format,
+            job.meta,
+            job.download_dir,
+            extension=".flac",
+        )
+
+        if job.final_path.exists():
+            logger.info(
+                f"⏭️  [dim]Skipped:[/dim] {job.meta['title']} (Exists)",
+                extra={"markup": True},
+            )
+            library_index.record(
+                job.track_id, job.final_path, None, job.download_dir, file_format
             )
+            return None
+
+        # 封面和歌词只依赖元数据，与音频下载同时进行
+        pool = get_side_pool()
+        if job.meta.get("coverId"):
+            job.cover_future = pool.submit(cover_cache.get, job.meta["coverId"])
+        job.lyrics_future = pool.submit(self._fetch_lyrics, job.track_id, job.meta)
+        return job
+
+    def _fetch_lyrics(self, track_id, meta):
+        lyrics = self.api.get_lyrics(track_id)
+        if not lyrics:
+            track_duration = meta.get("duration", 0)
+            if track_duration > 0:
+                lyrics = LRCLib.get_lyrics(
+                    meta["title"], meta["artist"], track_duration
+                )
+        return lyrics
 
-            success = False
-            for q in [quality_map[v] for v in qualities]:
+    def download_track(self, job):
+        """阶段二：按音质优先级下载音频，全部失败时返回 None"""
+        meta = job.meta
+        quality_map = {
+            "HI_RES": "HI_RES_LOSSLESS",
+            "LOSSLESS": "LOSSLESS",
+            "HIGH": "HIGH",
+        }
+        priority = ["HI_RES", "LOSSLESS", "HIGH"]
+
+        user_q = config["audio"]["max_quality"]
+        song_q = meta.get("audioQuality", "LOSSLESS")
+        start_idx = max(
+            priority.index(user_q) if user_q in priority else 0,
+            priority.index(song_q) if song_q in priority else 1,
+        )
+
+        qualities = (
+            priority[start_idx:]
+            if config["audio"]["auto_fallback"]
+            else [priority[start_idx]]
+        )
+
+        # 部分文件与断点日志在失败时保留，同一音质的重试从断点继续；
+        # 失败次数达到 track_failure_threshold 才降到下一档音质
+        threshold = max(1, config["network"]["track_failure_threshold"])
+        for q in self._rank_qualities(job, [quality_map[v] for v in qualities]):
+            for attempt in range(1, threshold + 1):
+                journal = DownloadJournal.open(job.partial_dir, job.track_id, q)
                 try:
-                    manifest = self.api.get_stream_manifest(track_id, q)
-                    self.download_dash(manifest, temp_audio)
-                    success = True
-                    break
+                    self._download_quality(job, q, journal)
+                    job.quality = q
+                    self._remember_quality(meta, q)
+                    return job
                 except Exception as e:
-                    logger.debug(f"Quality {q} failed: {e}")
+                    if not journal.manifest:
+                        # 该音质的 manifest 都拿不到，直接尝试下一档
+                        logger.debug(f"Quality {q} failed: {e}")
+                        break
+                    logger.debug(f"Quality {q} failed ({attempt}/{threshold}): {e}")
 
-            if not success:
-                logger.error(f"❌ Failed to download: {meta['title']}")
-                return
+        logger.error(f"❌ Failed to download: {meta['title']}")
+        return None
 
-            # 后处理
-            with console.status("[bold green]Processing...") as status:
-                has_cover = False
-                if meta.get("coverId"):
-                    status.update("[bold green]Cover...")
-                    try:
-                        cover_url = f"https://resources.tidal.com/images/{
-                            meta['coverId'].replace('-', '/')
-                        }/1280x1280.jpg"
-                        c_resp = fetch_get(cover_url)
-                        if c_resp.content:
-                            with open(temp_cover, "wb") as f:
-                                f.write(c_resp.content)
-                            has_cover = True
-                    except:
-                        pass
-
-                status.update("[bold green]Lyrics...")
-                lyrics = self.api.get_lyrics(track_id)
-                if not lyrics:
-                    track_duration = meta.get("duration", 0)
-                    if track_duration > 0:
-                        lyrics = LRCLib.get_lyrics(
-                            meta["title"], meta["artist"], track_duration
-                        )
-                if lyrics:
-                    with open(temp_lyrics, "w", encoding="utf-8") as f:
-                        f.write(lyrics["text"])
-                    if lyrics["isLrc"] and config["lyrics"]["save_lrc"]:
-                        with open(
-                            final_path.with_suffix(".lrc"), "w", encoding="utf-8"
-                        ) as f:
-                            f.write(lyrics["text"])
+    def _download_quality(self, job, quality, journal):
+        """按指定音质下载一次，失败时抛出异常"""
+        if config["ffmpeg"]["pipe_input"]:
+            try:
+                if self._download_piped(job, quality, journal):
+                    job.muxed = True
+                    return
+            except Exception as e:
+                if not journal.manifest:
+                    raise
+                logger.debug(f"管道封装失败，改用临时文件: {e}")
+        self._download_with_journal(job.track_id, quality, journal, job.meta["title"])
+        job.audio_path = journal.data_path
 
-                status.update("[bold green]Muxing...")
-                embed_metadata(
-                    temp_audio,
-                    temp_cover if has_cover else None,
-                    temp_lyrics if lyrics else None,
-                    meta,
-                    final_path,
+    def _rank_qualities(self, job, qualities):
+        """
+        决定各音质的尝试顺序
+        - 有断点的音质优先续传
+        - 同专辑已有歌曲成功过的音质直接从该档开始，不再试探更高音质
+        - 否则并发请求所有候选 manifest，从最高的可用音质开始，
+          其 manifest 写入断点日志，下载时直接复用；更低音质的试探随即取消
+        """
+        journals = {
+            q: DownloadJournal.open(job.partial_dir, job.track_id, q) for q in qualities
+        }
+        for q, journal in journals.items():
+            if journal.manifest and (journal.bytes or journal.ranges):
+                return [q] + [x for x in qualities if x != q]
+
+        with self._quality_lock:
+            remembered = self._album_quality.get(job.meta.get("albumId"))
+        if remembered in qualities:
+            return qualities[qualities.index(remembered) :]
+        if len(qualities) == 1:
+            return qualities
+
+        pool = get_probe_pool()
+        futures = {
+            q: pool.submit(self.api.get_stream_manifest, job.track_id, q)
+            for q in qualities
+        }
+        for i, q in enumerate(qualities):
+            try:
+                journals[q].update_manifest(futures[q].result())
+            except Exception as e:
+                logger.debug(f"Quality {q} unavailable: {e}")
+                continue
+            # 更低的音质只在降级时才用到，届时再获取 manifest
+            lower = qualities[i + 1 :]
+            for x in lower:
+                futures[x].cancel()
+            return [q] + lower
+        return []
+
+    def _remember_quality(self, meta, quality):
+        if meta.get("albumId"):
+            with self._quality_lock:
+                self._album_quality[meta["albumId"]] = quality
+
+    def _download_piped(self, job, quality, journal):
+        """
+        分段按序直接交给封装器 (内置 FLAC 封装或 ffmpeg 标准输入)，一次得到最终文件
+        已有断点或直链 (容器可能需要回读) 时返回 False，由调用方改走临时文件
+        """
+        if journal.bytes or journal.ranges:
+            return False
+        manifest = journal.manifest
+        if not manifest:
+            manifest = self.api.get_stream_manifest(job.track_id, quality)
+            # 记录 manifest，回退到临时文件时无需再次获取
+            journal.update_manifest(manifest)
+
+        parsed = DashParser.parse(manifest)
+        if not parsed or parsed["type"] != "dash":
+            return False
+        urls = DashParser.build_urls(parsed)
+        if not urls:
+            return False
+
+        refresh = partial(self._refresh_urls, job.track_id, quality, journal)
+        cover_path, lyrics = self._wait_extras(job)
+        with self._lyrics_file(job, lyrics) as lyrics_path:
+            if config["ffmpeg"]["native_flac"]:
+                remuxer = FlacRemuxer(cover_path, lyrics_path, job.meta, job.final_path)
+                try:
+                    self._stream_to(remuxer, urls, job.meta["title"], refresh)
+                    return True
+                except Exception:
+                    # AAC 等非 FLAC 流在读到 moov 时即可识别，改用 FFmpeg
+                    if remuxer.codec in (None, "fLaC"):
+                        raise
+                    logger.debug(f"音频编码为 {remuxer.codec}，改用 FFmpeg 封装")
+            muxer = PipeMuxer(cover_path, lyrics_path, job.meta, job.final_path)
+        self._stream_to(muxer, urls, job.meta["title"], refresh)
+        return True
+
+    def _stream_to(self, muxer, urls, label, refresh=None):
+        try:
+            self._write_segments(urls, muxer, label, refresh=refresh)
+            muxer.close()
+        except BaseException:
+            muxer.abort()
+            raise
+
+    def _mux_file(self, job, cover_path, lyrics_path):
+        """把临时音频文件封装为最终文件，FLAC 流优先使用内置封装器"""
+        if config["ffmpeg"]["native_flac"]:
+            try:
+                return remux_file(
+                    job.audio_path, cover_path, lyrics_path, job.meta, job.final_path
                 )
+            except RemuxError as e:
+                logger.debug(f"内置封装不适用，改用 FFmpeg: {e}")
+        embed_metadata(
+            job.audio_path, cover_path, lyrics_path, job.meta, job.final_path
+        )
 
-            logger.info(
-                f"✅ [bold green]Done:[/bold green] {final_path.name}",
-                extra={"markup": True},
-            )
+    def _wait_extras(self, job):
+        """等待封面与歌词就绪，返回 (封面路径, 歌词)"""
+        if job.extras is None:
+            cover_path = job.cover_future.result() if job.cover_future else None
+            lyrics = job.lyrics_future.result() if job.lyrics_future else None
+            if lyrics and lyrics["isLrc"] and config["lyrics"]["save_lrc"]:
+                lrc_path = job.final_path.with_suffix(".lrc")
+                with open(lrc_path, "w", encoding="utf-8") as f:
+                    f.write(lyrics["text"])
+            job.extras = (cover_path, lyrics)
+        return job.extras
+
+    @contextmanager
+    def _lyrics_file(self, job, lyrics):
+        """把歌词写入临时文件供 ffmpeg 读取，退出时删除"""
+        if not lyrics:
+            yield None
+            return
+        temp_id = "".join(random.choices(string.ascii_lowercase + string.digits, k=4))
+        temp_lyrics = job.download_dir / f"tmp_lyr_{temp_id}.txt"
+        try:
+            with open(temp_lyrics, "w", encoding="utf-8") as f:
+                f.write(lyrics["text"])
+            yield temp_lyrics
+        finally:
+            if temp_lyrics.exists():
+                temp_lyrics.unlink()
+
+    def finalize_track(self, job):
+        """阶段三：等待封面与歌词就绪，封装为最终文件"""
+        if not job.muxed:
+            with self._status("[bold green]Cover & Lyrics...") as status:
+                # 同专辑的歌曲共用同一封面，缓存命中时无需再次下载
+                cover_path, lyrics = self._wait_extras(job)
+
+                status.update("[bold green]Muxing...")
+                with self._lyrics_file(job, lyrics) as lyrics_path:
+                    self._mux_file(job, cover_path, lyrics_path)
+        DownloadJournal.discard_track(job.partial_dir, job.track_id)
+        library_index.record(
+            job.track_id,
+            job.final_path,
+            job.quality,
+            job.download_dir,
+            config["naming"]["file_format"],
+        )
+
+        logger.info(
+            f"✅ [bold green]Done:[/bold green] {job.final_path.name}",
+            extra={"markup": True},
+        )
+        return job
 
+    def process_track(self, track_id, download_dir, record=None):
+        """
+        处理单首歌曲的完整流程 (依次执行流水线的各个阶段)
+        record 为专辑/歌单接口返回的曲目对象，可省去一次元数据请求
+        """
+        job = self.new_job(track_id, download_dir, record)
+        try:
+            for stage in (self.prepare_track, self.download_track, self.finalize_track):
+                job = stage(job)
+                if job is None:
+                    return
         except Exception as e:
             logger.error(f"❌ Error processing track {track_id}: {e}")
         finally:
-            for p in [temp_audio, temp_cover, temp_lyrics]:
-                if p.exists():
-                    p.unlink()
+            self.cleanup_partial(download_dir)
+
+    def cleanup_partial(self, download_dir):
+        """一批歌曲全部结束后调用，删除下载目录中已空的部分文件目录"""
+        DownloadJournal.remove_partial_dir(Path(download_dir) / PARTIAL_DIR_NAME)
 
     def download_album(self, album_id, download_dir):
-        """下载整张专辑"""
-        data = self.api.get_album(album_id)
-        album_info = data["albumInfo"]
-        tracks = data["tracks"]
+        """下载整张专辑 (曲目列表逐页获取，边获取边下载)"""
+        album_info = self.api.get_album_info(album_id)
 
         artist = album_info.get("artist", {}).get("name") or "Unknown Artist"
         title = album_info.get("title", "Unknown Album")
 
         logger.info(
             f"💿 Album: [bold cyan]{title}[/bold cyan] - {artist} ({
-                len(tracks)
+                album_info.get("numberOfTracks", "?")
             } tracks)",
             extra={"markup": True},
         )
 
-        for track in tracks:
-            self.process_track(track["id"], download_dir)
+        def fill_album(t):
+            # 曲目对象里缺少的专辑信息从专辑本身补齐
+            # (id 用于同专辑共享已选定的音质)
+            album = dict(t.get("album") or {})
+            for key in ("title", "cover"):
+                if not album.get(key) and album_info.get(key):
+                    album[key] = album_info[key]
+            album["id"] = album.get("id") or album_info.get("id") or album_id
+            t["album"] = album
+            if not t.get("releaseDate") and album_info.get("releaseDate"):
+                t["releaseDate"] = album_info["releaseDate"]
+            return t
 
-    def download_playlist(self, tracks, download_dir):
-        """下载歌单中的所有歌曲"""
-        for i, track in enumerate(tracks):
-            logger.info(
-                f"\n[bold]Progress {i + 1}/{len(tracks)}:[/bold] {track.get('title')}",
-                extra={"markup": True},
-            )
-            self.process_track(track["id"], download_dir)
+        tracks = map(fill_album, self.api.iter_album(album_id, album_info))
+        TrackPipeline(self).run(tracks, download_dir)
 
+    def download_playlist(self, tracks, download_dir):
+        """
+        下载歌单中的所有歌曲，tracks 可以是列表或逐页产出的迭代器
+        返回本次实际下载完成的曲目 ID (已存在而跳过的不计入)
+        """
+        count = f"{len(tracks)} tracks" if hasattr(tracks, "__len__") else "tracks"
+        logger.info(
+            f"[bold]Queued {count}[/bold] "
+            f"({config['network']['track_concurrency']} at a time)",
+            extra={"markup": True},
+        )
+        return TrackPipeline(self).run(tracks, download_dir)
@@ -0,0 +1,200 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from streamfetch.config.settings import config
+from streamfetch.utils.http import HttpError, fetch_get
+
+logger = logging.getLogger("streamfetch")
+
+CLOSED = "closed"  # 正常可用
+OPEN = "open"  # 已熔断，等待后台探测
+HALF_OPEN = "half-open"  # 正在探测
+
+
+class Mirror:
+    """单个 API 镜像的健康状态"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency: Optional[float] = None  # 响应耗时 EWMA (秒)
+        self.error_rate = 0.0  # 失败率 EWMA (0~1)
+        self.failures = 0  # 连续失败次数
+        self.state = CLOSED
+        self.cooldown = 0.0
+        self.next_probe = 0.0
+
+    def score(self, penalty: float) -> float:
+        """预期耗时：平均延迟 + 失败率 × 一次失败的代价；未测量过延迟的镜像优先尝试"""
+        return (self.latency or 0.0) + self.error_rate * penalty
+
+
+class MirrorPool:
+    """
+    带健康评分的镜像池
+    每次 API 调用都路由到当前得分最好的可用镜像；连续失败达到阈值即熔断，
+    由后台线程在冷却后探测，探测成功才重新加入。
+    """
+
+    ALPHA = 0.3
+    # 计算对冲阈值所需的最少样本数
+    MIN_LATENCY_SAMPLES = 10
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+        penalty: float = 30.0,
+    ):
+        self._mirrors: Dict[str, Mirror] = {}
+        for url in urls:
+            url = url.rstrip("/")
+            self._mirrors.setdefault(url, Mirror(url))
+        if not self._mirrors:
+            raise Exception("配置文件中未找到有效 api_urls")
+
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.penalty = penalty
+        self._lock = threading.Lock()
+        self._prober: Optional[threading.Thread] = None
+        # 各接口最近成功请求的耗时，用于计算对冲阈值
+        self._recent: Dict[str, deque] = {}
+
+    def ranked(self, exclude: Iterable[str] = ()) -> List[str]:
+        """按得分从好到坏返回可用镜像；全部熔断时退而返回最早熔断的镜像"""
+        exclude = set(exclude)
+        with self._lock:
+            healthy = [
+                m
+                for m in self._mirrors.values()
+                if m.state == CLOSED and m.url not in exclude
+            ]
+            if healthy:
+                healthy.sort(key=lambda m: m.score(self.penalty))
+                return [m.url for m in healthy]
+
+            tripped = [m for m in self._mirrors.values() if m.url not in exclude]
+            tripped.sort(key=lambda m: m.next_probe)
+            return [m.url for m in tripped]
+
+    def best(self, exclude: Iterable[str] = ()) -> str:
+        ranked = self.ranked(exclude)
+        if not ranked:
+            # 所有镜像都被排除时，仍然返回最好的一个
+            ranked = self.ranked()
+        return ranked[0]
+
+    def report_success(self, url: str, latency: float, endpoint: str = ""):
+        with self._lock:
+            m = self._mirrors.get(url)
+            if m is None:
+                return
+            self._recent.setdefault(endpoint, deque(maxlen=200)).append(latency)
+            m.latency = (
+                latency
+                if m.latency is None
+                else self.ALPHA * latency + (1 - self.ALPHA) * m.latency
+            )
+            m.error_rate = (1 - self.ALPHA) * m.error_rate
+            m.failures = 0
+            if m.state != CLOSED:
+                logger.info(f"✅ 服务器已恢复: {url}")
+            m.state = CLOSED
+            m.cooldown = 0.0
+
+    def latency_percentile(self, q: float, endpoint: str = "") -> Optional[float]:
+        """某接口最近请求耗时的 q 分位数 (0~1)，样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self._recent.get(endpoint, ()))
+        if len(samples) < self.MIN_LATENCY_SAMPLES:
+            return None
+        idx = min(len(samples) - 1, max(0, math.ceil(q * len(samples)) - 1))
+        return samples[idx]
+
+    def report_failure(self, url: str):
+        tripped = False
+        with self._lock:
+            m = self._mirrors.get(url)
+            if m is None:
+                return
+            m.error_rate = self.ALPHA + (1 - self.ALPHA) * m.error_rate
+            m.failures += 1
+            if m.state == HALF_OPEN or (
+                m.state == CLOSED and m.failures >= self.failure_threshold
+            ):
+                self._trip(m)
+                tripped = True
+        if tripped:
+            logger.warning(f"⚠️ 服务器连续失败，已暂时停用: {url}")
+            self._ensure_prober()
+
+    def _trip(self, m: Mirror):
+        m.state = OPEN
+        m.cooldown = min(
+            self.max_cooldown, m.cooldown * 2 if m.cooldown else self.cooldown
+        )
+        m.next_probe = time.monotonic() + m.cooldown
+
+    def _ensure_prober(self):
+        with self._lock:
+            if self._prober is not None:
+                return
+            self._prober = threading.Thread(
+                target=self._probe_loop, name="sf-mirror-probe", daemon=True
+            )
+            self._prober.start()
+
+    def _probe_loop(self):
+        try:
+            while True:
+                now = time.monotonic()
+                with self._lock:
+                    opened = [m for m in self._mirrors.values() if m.state != CLOSED]
+                    due = [m for m in opened if m.state == OPEN and m.next_probe <= now]
+                    for m in due:
+                        m.state = HALF_OPEN
+                    if not opened:
+                        self._prober = None
+                        return
+                for m in due:
+                    self._probe(m)
+                time.sleep(1)
+        finally:
+            # 线程意外退出时允许下次熔断重新启动探测
+            with self._lock:
+                if self._prober is threading.current_thread():
+                    self._prober = None
+
+    def _probe(self, m: Mirror):
+        start = time.monotonic()
+        try:
+            fetch_get(f"{m.url}/")
+        except HttpError as e:
+            # 4xx 说明服务器在正常响应，只是根路径不提供内容
+            if e.status is None or e.status >= 500 or e.status == 429:
+                logger.debug(f"镜像探测失败 {m.url}: {e}")
+                with self._lock:
+                    self._trip(m)
+                return
+        except Exception as e:
+            # 其他异常同样视为探测失败，重新熔断等待下一轮，探测线程继续运行
+            logger.debug(f"镜像探测失败 {m.url}: {e}")
+            with self._lock:
+                self._trip(m)
+            return
+        self.report_success(m.url, time.monotonic() - start)
+
+
+mirror_pool = MirrorPool(
+    config["network"]["api_urls"],
+    failure_threshold=config["network"]["mirror_failure_threshold"],
+    cooldown=config["network"]["mirror_cooldown"],
+    penalty=config["network"]["timeout"],
+)
@@ -0,0 +1,145 @@
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from streamfetch.config.settings import config
+from streamfetch.tidal.scheduler import create_progress
+from streamfetch.utils.metrics import metrics
+
+logger = logging.getLogger("streamfetch")
+
+# 队列结束标记
+_DONE = object()
+
+
+def mux_workers() -> int:
+    """后处理 (ffmpeg 封装) 并发数，未配置时跟随 CPU 核数"""
+    workers = config["ffmpeg"].get("workers") or 0
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, workers)
+
+
+class Stage:
+    """
+    流水线中的一个阶段
+    func 接收上一阶段产出的任务，返回交给下一阶段的任务；返回 None 表示该曲目到此结束 (跳过或失败)
+    """
+
+    def __init__(self, name: str, func: Callable, workers: int):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+
+class TrackPipeline:
+    """
+    分阶段的曲目流水线：获取元数据 -> 下载音频 -> 后处理/封装
+    每个阶段有独立的线程和有界队列，第 N 首歌在封装时第 N+1 首已经在下载；
+    下载阶段的并发跟随 network.track_concurrency，封装阶段跟随 CPU 核数。
+    """
+
+    def __init__(self, downloader, stages: Optional[List[Stage]] = None):
+        self.downloader = downloader
+        track_concurrency = config["network"]["track_concurrency"]
+        self.stages = stages or [
+            Stage("fetch", downloader.prepare_track, track_concurrency),
+            Stage("download", downloader.download_track, track_concurrency),
+            Stage("mux", downloader.finalize_track, mux_workers()),
+        ]
+        # 每个阶段的输入队列容量等于该阶段的线程数，上游最多领先一批
+        self._queues = [queue.Queue(maxsize=s.workers) for s in self.stages]
+        self._alive = [s.workers for s in self.stages]
+        self._lock = threading.Lock()
+        self._on_finish = None
+        # 走完所有阶段的曲目 ID (跳过与失败的不计入)
+        self.completed: List[str] = []
+
+    def run(self, tracks, download_dir):
+        """
+        tracks 可以是列表，也可以是逐页产出曲目的迭代器：
+        入口队列有界，迭代器只会按下载进度被消费，第一页到达即开始下载
+        返回走完所有阶段的曲目 ID
+        """
+        total = len(tracks) if hasattr(tracks, "__len__") else None
+        if total == 0:
+            return self.completed
+
+        with create_progress() as progress:
+            overall = progress.add_task("📀 Tracks", total=total)
+            self._on_finish = lambda: progress.advance(overall)
+            self.downloader.progress = progress
+            try:
+                threads = self._start()
+                count = 0
+                try:
+                    for track in tracks:
+                        count += 1
+                        self._queues[0].put(
+                            self.downloader.new_job(track["id"], download_dir, track)
+                        )
+                except Exception as e:
+                    logger.error(f"❌ 获取曲目列表失败，已加入队列的歌曲继续下载: {e}")
+                finally:
+                    # 迭代器耗尽 (或出错) 后才知道总数
+                    progress.update(overall, total=count)
+                    self._close(0)
+                for t in threads:
+                    t.join()
+                self.downloader.cleanup_partial(download_dir)
+            finally:
+                self.downloader.progress = None
+                logger.debug(f"📊 Metrics: {metrics.snapshot()}")
+        return self.completed
+
+    def _start(self) -> List[threading.Thread]:
+        threads = []
+        for idx, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                t = threading.Thread(
+                    target=self._worker,
+                    args=(idx,),
+                    name=f"sf-{stage.name}-{n}",
+                    daemon=True,
+                )
+                t.start()
+                threads.append(t)
+        return threads
+
+    def _close(self, idx: int):
+        for _ in range(self.stages[idx].workers):
+            self._queues[idx].put(_DONE)
+
+    def _worker(self, idx: int):
+        stage = self.stages[idx]
+        inbox = self._queues[idx]
+        outbox = self._queues[idx + 1] if idx + 1 < len(self.stages) else None
+
+        while True:
+            job = inbox.get()
+            if job is _DONE:
+                break
+            started = time.monotonic()
+            try:
+                result = stage.func(job)
+            except Exception as e:
+                logger.error(f"❌ Error processing track {job.track_id}: {e}")
+                result = None
+            metrics.observe(f"stage.{stage.name}", time.monotonic() - started)
+            if result is not None and outbox is not None:
+                outbox.put(result)
+                continue
+            if result is not None:
+                self.completed.append(str(result.track_id))
+            if self._on_finish is not None:
+                self._on_finish()
+
+        # 本阶段最后一个线程退出时，通知下一阶段收尾
+        with self._lock:
+            self._alive[idx] -= 1
+            last = self._alive[idx] == 0
+        if last and outbox is not None:
+            self._close(idx + 1)
@@ -0,0 +1,82 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from rich.progress import (
+    Progress,
+    SpinnerColumn,
+    BarColumn,
+    TextColumn,
+    TimeRemainingColumn,
+    MofNCompleteColumn,
+)
+from streamfetch.config.settings import config
+from streamfetch.utils.logging_config import console
+from streamfetch.utils.adaptive import adaptive_controller
+
+logger = logging.getLogger("streamfetch")
+
+_segment_pool = None
+_side_pool = None
+_probe_pool = None
+_segment_pool_lock = threading.Lock()
+
+
+def get_segment_pool() -> ThreadPoolExecutor:
+    """
+    全局共享的分段下载线程池
+    所有曲目的分段请求都提交到这里，线程数等于并发窗口上限；
+    实际在途请求数由各主机的 AIMD 窗口 (utils.adaptive) 控制
+    """
+    global _segment_pool
+    with _segment_pool_lock:
+        if _segment_pool is None:
+            _segment_pool = ThreadPoolExecutor(
+                max_workers=adaptive_controller.maximum,
+                thread_name_prefix="sf-segment",
+            )
+        return _segment_pool
+
+
+def get_side_pool() -> ThreadPoolExecutor:
+    """封面、歌词等附属请求使用的线程池，与音频分段下载互不占用"""
+    global _side_pool
+    with _segment_pool_lock:
+        if _side_pool is None:
+            _side_pool = ThreadPoolExecutor(
+                max_workers=8, thread_name_prefix="sf-side"
+            )
+        return _side_pool
+
+
+def get_probe_pool() -> ThreadPoolExecutor:
+    """
+    音质试探 (并发请求各音质 manifest) 专用的线程池
+    试探挡在下载之前，不能排在封面、歌词等附属请求后面；
+    线程数按同时下载的曲目数 × 音质档数准备
+    """
+    global _probe_pool
+    with _segment_pool_lock:
+        if _probe_pool is None:
+            _probe_pool = ThreadPoolExecutor(
+                max_workers=max(1, config["network"]["track_concurrency"]) * 3,
+                thread_name_prefix="sf-probe",
+            )
+        return _probe_pool
+
+
+def create_progress() -> Progress:
+    """统一的进度条样式"""
+    return Progress(
+        SpinnerColumn(),
+        TextColumn("[bold cyan]{task.description}"),
+        BarColumn(bar_width=30),
+        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+        "•",
+        MofNCompleteColumn(),
+        "•",
+        TimeRemainingColumn(),
+        console=console,
+        transient=True,
+    )
+
@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from streamfetch.utils.filename import sanitize_filename
+from streamfetch.utils.library import library_index
+from streamfetch.utils.storage import get_database
+
+logger = logging.getLogger("streamfetch")
+
+
+class PlaylistSnapshots:
+    """
+    每个歌单上次同步完成时的曲目 ID 列表与 lastUpdated 标记
+    owned 记录由 sync 自己下载的曲目，--prune 只删除这些文件
+    """
+
+    def __init__(self):
+        self._ready = False
+
+    def _db(self):
+        db = get_database()
+        if not self._ready:
+            with db.cursor() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS playlist_snapshots (
+                        playlist_id TEXT PRIMARY KEY,
+                        title TEXT,
+                        marker TEXT,
+                        track_ids TEXT NOT NULL,
+                        owned TEXT NOT NULL DEFAULT '[]',
+                        synced_at REAL NOT NULL
+                    )
+                    """
+                )
+                columns = {
+                    row["name"]
+                    for row in conn.execute("PRAGMA table_info(playlist_snapshots)")
+                }
+                # 旧版本的快照没有 owned 列，其中的曲目一律视为非 sync 下载
+                if "owned" not in columns:
+                    conn.execute(
+                        "ALTER TABLE playlist_snapshots "
+                        "ADD COLUMN owned TEXT NOT NULL DEFAULT '[]'"
+                    )
+            self._ready = True
+        return db
+
+    def get(self, playlist_id) -> Optional[dict]:
+        with self._db().cursor() as conn:
+            row = conn.execute(
+                "SELECT title, marker, track_ids, owned FROM playlist_snapshots "
+                "WHERE playlist_id = ?",
+                (playlist_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "title": row["title"],
+            "marker": row["marker"],
+            "trackIds": json.loads(row["track_ids"]),
+            "owned": json.loads(row["owned"]),
+        }
+
+    def save(self, playlist_id, title, marker, track_ids: List[str], owned: List[str]):
+        with self._db().cursor() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO playlist_snapshots "
+                "(playlist_id, title, marker, track_ids, owned, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    playlist_id,
+                    title,
+                    marker,
+                    json.dumps(track_ids),
+                    json.dumps(owned),
+                    time.time(),
+                ),
+            )
+
+    def referenced_elsewhere(self, track_id, playlist_id) -> bool:
+        """其他已同步的歌单是否也包含这首歌"""
+        with self._db().cursor() as conn:
+            rows = conn.execute(
+                "SELECT track_ids FROM playlist_snapshots WHERE playlist_id != ?",
+                (playlist_id,),
+            ).fetchall()
+        return any(track_id in json.loads(row["track_ids"]) for row in rows)
+
+
+playlist_snapshots = PlaylistSnapshots()
+
+
+class PlaylistSync:
+    """
+    增量同步歌单
+    与上次的快照比较，只下载新增的歌曲；歌单的 lastUpdated 未变化时连曲目列表都不用拉取。
+    下载失败的歌曲不会写入快照，下次同步时重新尝试。
+    --prune 只删除 sync 自己下载的文件，同步前已存在的文件保持不变。
+    """
+
+    def __init__(self, api, downloader):
+        self.api = api
+        self.downloader = downloader
+
+    def run(self, playlist_id, download_dir, prune=False, m3u=False):
+        download_dir = Path(download_dir)
+        snapshot = playlist_snapshots.get(playlist_id)
+        # fresh=True 绕过缓存，第一页只请求一次，列曲目时直接复用
+        info, first = self.api.get_playlist_head(playlist_id, fresh=True)
+        title = info.get("title") or playlist_id
+        marker = info.get("lastUpdated")
+        marker = str(marker) if marker else None
+
+        if snapshot and marker and snapshot["marker"] == marker:
+            logger.info(
+                f"✅ [bold green]Up to date:[/bold green] {title}",
+                extra={"markup": True},
+            )
+            if m3u:
+                self.write_m3u(title, snapshot["trackIds"], download_dir)
+            return
+
+        # 只保留 ID 与新增曲目的记录，超长歌单的内存占用与变化量成正比
+        previous = set(snapshot["trackIds"]) if snapshot else set()
+        owned = set(snapshot["owned"]) if snapshot else set()
+        current = {}
+        added = []
+        for t in self.api.iter_playlist(playlist_id, fresh=True, first=first):
+            track_id = str(t["id"])
+            if track_id in current:
+                continue
+            current[track_id] = None
+            if track_id not in previous:
+                added.append(t)
+        current = list(current)
+        removed = sorted(previous.difference(current))
+        logger.info(
+            f"🔁 [bold]{title}[/bold]: +{len(added)} / -{len(removed)} "
+            f"({len(current)} tracks)",
+            extra={"markup": True},
+        )
+
+        if added:
+            owned.update(self.downloader.download_playlist(added, download_dir))
+
+        # 只有确实已在本地的新增歌曲才算同步完成
+        synced = [
+            i for i in current if i in previous or library_index.lookup(i) is not None
+        ]
+        if prune:
+            self.prune(playlist_id, removed, owned)
+
+        complete = len(synced) == len(current)
+        if not complete:
+            logger.warning(
+                f"⚠️ {len(current) - len(synced)} 首歌曲未能下载，下次同步时重试"
+            )
+        playlist_snapshots.save(
+            playlist_id,
+            title,
+            marker if complete else None,
+            synced,
+            sorted(owned.intersection(synced)),
+        )
+        if m3u:
+            self.write_m3u(title, synced, download_dir)
+
+    def prune(self, playlist_id, removed, owned):
+        """
+        删除已从歌单移除的歌曲
+        只处理由 sync 下载的文件 (owned)，其他已同步歌单仍包含的除外
+        """
+        for track_id in removed:
+            if track_id not in owned:
+                continue
+            if playlist_snapshots.referenced_elsewhere(track_id, playlist_id):
+                continue
+            path = library_index.lookup(track_id)
+            if path is None:
+                continue
+            for p in (path, path.with_suffix(".lrc")):
+                p.unlink(missing_ok=True)
+            library_index.forget(track_id)
+            logger.info(f"🗑️  [dim]Removed:[/dim] {path.name}", extra={"markup": True})
+
+    @staticmethod
+    def write_m3u(title, track_ids, download_dir: Path):
+        """按歌单顺序写出 M3U8 播放列表，路径相对于播放列表文件"""
+        m3u_path = download_dir / f"{sanitize_filename(title)}.m3u8"
+        lines = ["#EXTM3U"]
+        for track_id in track_ids:
+            path = library_index.lookup(track_id)
+            if path is not None:
+                lines.append(Path(os.path.relpath(path, m3u_path.parent)).as_posix())
+        with open(m3u_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        logger.info(f"📝 Playlist file: {m3u_path}")
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+from streamfetch.config.settings import config
+from streamfetch.utils.metrics import metrics
+
+logger = logging.getLogger("streamfetch")
+
+
+class AdaptiveLimiter:
+    """
+    单个主机的 AIMD 并发窗口
+    - 加性增：每完成一个窗口的请求统计一次吞吐，比上一轮提升时窗口 +1
+    - 乘性减：遇到 429/5xx/超时时窗口减半，减半前已发出的请求再失败不重复减
+    窗口始终在 [minimum, maximum] 之间
+    """
+
+    # 吞吐至少提升这么多才继续加并发，避免噪声推着窗口上涨
+    GAIN = 1.05
+    DECREASE = 0.5
+
+    def __init__(self, host: str, minimum: int, maximum: int, initial: int):
+        self.host = host
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.window = min(self.maximum, max(self.minimum, initial))
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._epoch_start = None
+        self._epoch_done = 0
+        self._epoch_bytes = 0
+        self._last_rate = 0.0
+        self._last_cut = 0.0
+
+    def acquire(self) -> float:
+        """等待空位，返回请求发出的时间，释放时原样传回"""
+        with self._cond:
+            while self.in_flight >= self.window:
+                self._cond.wait()
+            self.in_flight += 1
+            now = time.monotonic()
+            if self._epoch_start is None:
+                self._epoch_start = now
+            return now
+
+    def release(self, started: float, nbytes: int = 0, congested: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            if congested:
+                self._decrease(started)
+            else:
+                self._record(nbytes)
+            self._cond.notify_all()
+
+    def _record(self, nbytes: int):
+        self._epoch_done += 1
+        self._epoch_bytes += nbytes
+        if self._epoch_done < self.window:
+            return
+        elapsed = max(1e-6, time.monotonic() - self._epoch_start)
+        rate = self._epoch_bytes / elapsed
+        if rate > self._last_rate * self.GAIN and self.window < self.maximum:
+            self._resize(self.window + 1, "吞吐提升")
+        self._last_rate = rate
+        self._reset_epoch()
+
+    def _decrease(self, started: float):
+        metrics.incr(f"congestion.{self.host}")
+        # 上次减半之前发出的请求反映的是同一次拥塞，不再重复减
+        if started < self._last_cut:
+            return
+        self._last_cut = time.monotonic()
+        self._resize(max(self.minimum, int(self.window * self.DECREASE)), "限流/出错")
+        self._last_rate = 0.0
+        self._reset_epoch()
+
+    def _reset_epoch(self):
+        self._epoch_start = time.monotonic() if self.in_flight else None
+        self._epoch_done = 0
+        self._epoch_bytes = 0
+
+    def _resize(self, window: int, reason: str):
+        if window != self.window:
+            logger.debug(f"🔧 {self.host} 并发窗口 {self.window} → {window} ({reason})")
+            self.window = window
+
+
+class AdaptiveController:
+    """按主机 (各 API 镜像、音频 CDN) 分别维护并发窗口"""
+
+    def __init__(self, minimum: int, maximum: int, initial: int, enabled=True):
+        if not enabled:
+            # 关闭自适应时窗口固定为初始值
+            minimum = maximum = initial
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.initial = initial
+        self._lock = threading.Lock()
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def limiter(self, url: str) -> AdaptiveLimiter:
+        host = urlsplit(url).netloc
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = AdaptiveLimiter(
+                    host, self.minimum, self.maximum, self.initial
+                )
+                self._limiters[host] = limiter
+                metrics.gauge(f"concurrency.{host}", lambda: limiter.window)
+            return limiter
+
+
+adaptive_controller = AdaptiveController(
+    config["network"]["concurrency_min"],
+    config["network"]["concurrency_max"],
+    config["network"]["concurrency"],
+    enabled=config["network"]["adaptive_concurrency"],
+)
@@ -0,0 +1,186 @@
+import json
+import logging
+import re
+import time
+from typing import Any, Optional, Tuple
+
+from streamfetch.config.settings import config
+from streamfetch.utils.storage import get_database
+
+logger = logging.getLogger("streamfetch")
+
+
+class OfflineCacheMiss(Exception):
+    """离线模式下请求的数据不在缓存中"""
+
+
+class MetadataCache:
+    """
+    API 元数据的持久化缓存
+    以 接口路径 + 参数 为键保存原始 JSON 响应，各接口有独立的有效期；
+    离线模式下忽略有效期，缓存未命中直接报错。
+    """
+
+    def __init__(self):
+        self._ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return config["cache"]["enabled"] or self.offline
+
+    @property
+    def offline(self) -> bool:
+        return config["cache"]["offline"]
+
+    @staticmethod
+    def ttl(path: str) -> float:
+        """/album/items/ -> album_ttl_hours"""
+        name = path.strip("/").split("/")[0]
+        return config["cache"].get(f"{name}_ttl_hours", 0) * 3600
+
+    @staticmethod
+    def make_key(path: str, params: Optional[dict]) -> str:
+        items = sorted((k, str(v)) for k, v in (params or {}).items())
+        return f"{path}?{json.dumps(items, ensure_ascii=False)}"
+
+    def _db(self):
+        db = get_database()
+        if not self._ready:
+            with db.cursor() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS api_cache (
+                        key TEXT PRIMARY KEY,
+                        body TEXT NOT NULL,
+                        fetched_at REAL NOT NULL
+                    )
+                    """
+                )
+            self._ready = True
+        return db
+
+    def get(self, path: str, params: Optional[dict] = None) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        ttl = self.ttl(path)
+        if ttl <= 0 and not self.offline:
+            return None
+        try:
+            with self._db().cursor() as conn:
+                row = conn.execute(
+                    "SELECT body, fetched_at FROM api_cache WHERE key = ?",
+                    (self.make_key(path, params),),
+                ).fetchone()
+        except Exception as e:
+            logger.debug(f"读取缓存失败: {e}")
+            return None
+        if row is None:
+            return None
+        if not self.offline and time.time() - row["fetched_at"] > ttl:
+            return None
+        return json.loads(row["body"])
+
+    def put(self, path: str, params: Optional[dict], data: Any):
+        if not self.enabled or self.ttl(path) <= 0:
+            return
+        try:
+            with self._db().cursor() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO api_cache (key, body, fetched_at) "
+                    "VALUES (?, ?, ?)",
+                    (
+                        self.make_key(path, params),
+                        json.dumps(data, ensure_ascii=False),
+                        time.time(),
+                    ),
+                )
+        except Exception as e:
+            logger.debug(f"写入缓存失败: {e}")
+
+
+metadata_cache = MetadataCache()
+
+
+class LyricsCache:
+    """
+    歌词持久化缓存，支持负缓存
+    Tidal 歌词以曲目 ID 为键，LRCLib 歌词以规范化的 (歌手, 歌名, 时长) 为键；
+    "未找到" 同样会被记录，在 lyrics.miss_cache_days 内不再重复查询。
+    """
+
+    def __init__(self):
+        self._ready = False
+
+    @staticmethod
+    def track_key(track_id) -> str:
+        return f"tidal:{track_id}"
+
+    @staticmethod
+    def lookup_key(artist: str, title: str, duration) -> str:
+        def norm(value):
+            return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+        return f"lrclib:{norm(artist)}|{norm(title)}|{int(round(duration or 0))}"
+
+    def _db(self):
+        db = get_database()
+        if not self._ready:
+            with db.cursor() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS lyrics_cache (
+                        key TEXT PRIMARY KEY,
+                        text TEXT,
+                        is_lrc INTEGER NOT NULL DEFAULT 0,
+                        fetched_at REAL NOT NULL
+                    )
+                    """
+                )
+            self._ready = True
+        return db
+
+    def get(self, key: str) -> Tuple[bool, Optional[dict]]:
+        """返回 (是否命中, 歌词)；命中但歌词为 None 表示之前确认过没有歌词"""
+        if not config["cache"]["enabled"] and not config["cache"]["offline"]:
+            return False, None
+        try:
+            with self._db().cursor() as conn:
+                row = conn.execute(
+                    "SELECT text, is_lrc, fetched_at FROM lyrics_cache WHERE key = ?",
+                    (key,),
+                ).fetchone()
+        except Exception as e:
+            logger.debug(f"读取歌词缓存失败: {e}")
+            return False, None
+        if row is None:
+            return False, None
+
+        found = row["text"] is not None
+        days = config["lyrics"]["cache_days" if found else "miss_cache_days"]
+        expired = time.time() - row["fetched_at"] > days * 86400
+        if expired and not config["cache"]["offline"]:
+            return False, None
+        if not found:
+            return True, None
+        return True, {"text": row["text"], "isLrc": bool(row["is_lrc"])}
+
+    def put(self, key: str, lyrics: Optional[dict]):
+        if not config["cache"]["enabled"]:
+            return
+        try:
+            with self._db().cursor() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO lyrics_cache (key, text, is_lrc, fetched_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        key,
+                        lyrics["text"] if lyrics else None,
+                        int(bool(lyrics and lyrics["isLrc"])),
+                        time.time(),
+                    ),
+                )
+        except Exception as e:
+            logger.debug(f"写入歌词缓存失败: {e}")
+
+
+lyrics_cache = LyricsCache()
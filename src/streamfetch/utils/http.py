@@ -1,25 +1,22 @@
+from contextlib import contextmanager
+
 import requests
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from streamfetch.config.api_targets import HEADERS
 from streamfetch.config.settings import config  # 导入配置
+from streamfetch.utils.adaptive import adaptive_controller
+from streamfetch.utils.ratelimit import bandwidth_limiter, request_limiter
 
 _session = requests.Session()
 
-# 从配置读取重试次数
-retries_count = config["network"]["max_retries"]
-concurrency = config["network"]["concurrency"]
-retries = Retry(
-    total=retries_count,
-    backoff_factor=1,
-    status_forcelist=[429, 500, 502, 503, 504],
-    allowed_methods=["GET"],
-)
+# 每个主机的实际并发由 AIMD 窗口控制，连接池按窗口上限准备
+concurrency = adaptive_controller.maximum
 
+# 连接层不做重试，重试统一由 utils.retry.RetryPolicy 负责，避免层层叠加
 adapter = HTTPAdapter(
     #pool_connections=concurrency + 5, 
     pool_maxsize=concurrency + 5,
-    max_retries=retries
+    max_retries=0,
 )
 _session.mount("https://", adapter)
 _session.mount("http://", adapter)
@@ -29,11 +26,147 @@ _session.headers.update(HEADERS)
 TIMEOUT = config["network"]["timeout"]
 
 
-def fetch_get(url: str, params=None, stream=False) -> requests.Response:
+def _fresh_session() -> requests.Session:
+    """
+    一次性会话：保证新建连接，不会拿到连接池里已经卡住的连接
+    会话随响应一起关闭，见 _close_session_with
+    """
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(max_retries=0))
+    session.mount("http://", HTTPAdapter(max_retries=0))
+    session.headers.update(HEADERS)
+    return session
+
+
+def _close_session_with(response: requests.Response, session: requests.Session):
+    """调用方关闭响应时一并关闭一次性会话，释放它独占的连接池"""
+    close_response = response.close
+
+    def close():
+        try:
+            close_response()
+        finally:
+            session.close()
+
+    response.close = close
+
+
+class HttpError(Exception):
+    """
+    网络请求异常
+    status 为 HTTP 状态码，未收到响应 (超时、连接失败等) 时为 None；
+    timeout 表示是否为超时；retry_after 为服务器要求的等待秒数 (429/503)
+    """
+
+    def __init__(self, message, status=None, timeout=False, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.timeout = timeout
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _raise_http_error(e: requests.exceptions.RequestException):
+    response = getattr(e, "response", None)
+    raise HttpError(
+        f"网络请求失败: {e}",
+        status=response.status_code if response is not None else None,
+        timeout=isinstance(e, requests.exceptions.Timeout),
+        retry_after=_parse_retry_after(response) if response is not None else None,
+    ) from e
+
+
+def is_congestion(e: BaseException) -> bool:
+    """429、5xx 与超时说明对方已过载，AIMD 控制器据此收缩并发"""
+    if isinstance(e, HttpError):
+        return e.timeout or e.status == 429 or (e.status or 0) >= 500
+    if isinstance(e, requests.exceptions.Timeout):
+        return True
+    response = getattr(e, "response", None)
+    return response is not None and (
+        response.status_code == 429 or response.status_code >= 500
+    )
+
+
+@contextmanager
+def host_slot(url: str):
+    """
+    占用 url 所在主机的一个并发名额
+    调用方把传输的字节数写入 transfer["bytes"]，结束时连同成败一起反馈给 AIMD 控制器
+    """
+    limiter = adaptive_controller.limiter(url)
+    started = limiter.acquire()
+    transfer = {"bytes": 0}
+    try:
+        yield transfer
+    except BaseException as e:
+        limiter.release(started, congested=is_congestion(e))
+        raise
+    limiter.release(started, transfer["bytes"])
+
+
+def fetch_get(
+    url: str, params=None, stream=False, headers=None, timeout=None, fresh=False
+) -> requests.Response:
+    """
+    非流式请求在这里占用主机并发名额；
+    流式请求的响应体由调用方通过 iter_body 读取，需要限流时由调用方自行使用 host_slot
+    fresh=True 时在新连接上发起请求 (仅限流式请求)
+    """
+    # 先按主机的请求速率排队，排队期间不占用并发名额
+    request_limiter.wait(url)
+    try:
+        if stream:
+            session = _fresh_session() if fresh else _session
+            try:
+                response = session.get(
+                    url,
+                    params=params,
+                    timeout=timeout or TIMEOUT,
+                    stream=True,
+                    headers=headers,
+                )
+                response.raise_for_status()
+            except BaseException:
+                if fresh:
+                    session.close()
+                raise
+            if fresh:
+                _close_session_with(response, session)
+            return response
+        with host_slot(url) as transfer:
+            response = _session.get(
+                url, params=params, timeout=timeout or TIMEOUT, headers=headers
+            )
+            response.raise_for_status()
+            transfer["bytes"] = len(response.content)
+            bandwidth_limiter.consume(transfer["bytes"])
+            return response
+    except requests.exceptions.RequestException as e:
+        _raise_http_error(e)
+
+
+def iter_body(response: requests.Response, chunk_size: int):
+    """流式读取响应体，每读一块都向全局带宽令牌桶扣除相应字节"""
+    for piece in response.iter_content(chunk_size=chunk_size):
+        bandwidth_limiter.consume(len(piece))
+        yield piece
+
+
+def fetch_head(url: str, timeout=None) -> requests.Response:
+    request_limiter.wait(url)
     try:
-        response = _session.get(url, params=params, timeout=TIMEOUT, stream=stream)
+        response = _session.head(
+            url, timeout=timeout or TIMEOUT, allow_redirects=True
+        )
         response.raise_for_status()
         return response
     except requests.exceptions.RequestException as e:
-        raise Exception(f"网络请求失败: {e}")
+        _raise_http_error(e)
 
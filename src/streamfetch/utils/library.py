@@ -0,0 +1,209 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from streamfetch.dash.journal import PARTIAL_DIR_NAME
+from streamfetch.media.flac import TRACK_ID_TAG, read_flac_info
+from streamfetch.utils.storage import get_database
+
+logger = logging.getLogger("streamfetch")
+
+
+class LibraryIndex:
+    """
+    本地曲库索引：曲目 ID -> 文件路径、音质、大小、修改时间
+    每次封装成功后写入，同时记下当时的下载目录与命名格式；
+    下载前先查索引，两者与当前配置一致时无需请求任何 API 即可跳过。
+    文件被删除或改动后索引自动失效。
+    """
+
+    def __init__(self):
+        self._ready = False
+
+    def _db(self):
+        db = get_database()
+        if not self._ready:
+            with db.cursor() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS library (
+                        track_id TEXT PRIMARY KEY,
+                        path TEXT NOT NULL,
+                        quality TEXT,
+                        size INTEGER NOT NULL,
+                        mtime REAL NOT NULL,
+                        indexed_at REAL NOT NULL,
+                        download_dir TEXT,
+                        file_format TEXT
+                    )
+                    """
+                )
+                columns = {
+                    row["name"] for row in conn.execute("PRAGMA table_info(library)")
+                }
+                # 旧版本的索引没有记录下载目录与命名格式，这些行只能按路径比对
+                for column in ("download_dir", "file_format"):
+                    if column not in columns:
+                        conn.execute(f"ALTER TABLE library ADD COLUMN {column} TEXT")
+            self._ready = True
+        return db
+
+    def lookup(self, track_id) -> Optional[Path]:
+        """返回已下载文件的路径；不在索引中或文件已变化时返回 None"""
+        return self._lookup(track_id)
+
+    def lookup_in(self, track_id, download_dir, file_format) -> Optional[Path]:
+        """
+        只在写入索引时的下载目录与命名格式与传入的一致时返回文件路径，
+        此时文件位置与重新按元数据渲染的结果相同，调用方无需获取元数据
+        """
+        return self._lookup(track_id, (_dir_key(download_dir), file_format))
+
+    def _lookup(self, track_id, layout=None) -> Optional[Path]:
+        try:
+            with self._db().cursor() as conn:
+                row = conn.execute(
+                    "SELECT path, size, download_dir, file_format FROM library "
+                    "WHERE track_id = ?",
+                    (str(track_id),),
+                ).fetchone()
+        except Exception as e:
+            logger.debug(f"读取曲库索引失败: {e}")
+            return None
+        if row is None:
+            return None
+        if layout is not None and layout != (row["download_dir"], row["file_format"]):
+            return None
+
+        path = Path(row["path"])
+        try:
+            if path.stat().st_size == row["size"]:
+                return path
+        except OSError:
+            pass
+        self.forget(track_id)
+        return None
+
+    def record(self, track_id, path, quality=None, download_dir=None, file_format=None):
+        """download_dir 与 file_format 为生成该路径时使用的配置，供 lookup_in 比对"""
+        try:
+            st = Path(path).stat()
+            with self._db().cursor() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO library "
+                    "(track_id, path, quality, size, mtime, indexed_at, "
+                    "download_dir, file_format) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        str(track_id),
+                        str(Path(path).resolve()),
+                        quality,
+                        st.st_size,
+                        st.st_mtime,
+                        time.time(),
+                        _dir_key(download_dir) if download_dir else None,
+                        file_format,
+                    ),
+                )
+        except Exception as e:
+            logger.debug(f"写入曲库索引失败: {e}")
+
+    def forget(self, track_id):
+        try:
+            with self._db().cursor() as conn:
+                conn.execute("DELETE FROM library WHERE track_id = ?", (str(track_id),))
+        except Exception as e:
+            logger.debug(f"删除曲库索引失败: {e}")
+
+    @staticmethod
+    def _scan_file(path: Path):
+        info = read_flac_info(path)
+        if not info or not info["tags"].get(TRACK_ID_TAG):
+            return None
+        st = path.stat()
+        hi_res = info["bitsPerSample"] > 16 or info["sampleRate"] > 48000
+        return (
+            info["tags"][TRACK_ID_TAG],
+            str(path.resolve()),
+            "HI_RES_LOSSLESS" if hi_res else "LOSSLESS",
+            st.st_size,
+            st.st_mtime,
+            time.time(),
+        )
+
+    def rebuild(self, root, workers: Optional[int] = None) -> int:
+        """
+        并发扫描 root 下的 FLAC 文件，根据内嵌的曲目 ID 重建该目录的索引
+        没有内嵌 ID 的文件 (其他工具下载或被改写过标签) 无法与曲目对应，
+        只保留原索引中路径与大小均未变化的记录，其余不收录。
+        返回收录的歌曲数
+        """
+        root = Path(root).resolve()
+        files = [
+            Path(dirpath) / name
+            for dirpath, dirnames, filenames in os.walk(root)
+            if PARTIAL_DIR_NAME not in Path(dirpath).parts
+            for name in filenames
+            if name.lower().endswith(".flac")
+        ]
+
+        workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="sf-scan"
+        ) as executor:
+            results = list(executor.map(self._scan_file, files))
+        rows = [r for r in results if r]
+        untagged = [f for f, r in zip(files, results) if r is None]
+
+        prefix = str(root) + os.sep
+        with self._db().transaction() as conn:
+            existing = {
+                row["path"]: row
+                for row in conn.execute(
+                    "SELECT track_id, path, quality, size, mtime, indexed_at, "
+                    "download_dir, file_format "
+                    "FROM library WHERE substr(path, 1, ?) = ?",
+                    (len(prefix), prefix),
+                )
+            }
+            kept = []
+            for f in untagged:
+                row = existing.get(str(f.resolve()))
+                if row is not None and f.stat().st_size == row["size"]:
+                    kept.append(tuple(row))
+            # 文件仍在原位时保留写入时的下载目录与命名格式，否则只能按路径比对
+            for i, r in enumerate(rows):
+                row = existing.get(r[1])
+                if row is not None and row["track_id"] == r[0]:
+                    rows[i] = r + (row["download_dir"], row["file_format"])
+                else:
+                    rows[i] = r + (None, None)
+            conn.execute(
+                "DELETE FROM library WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix),
+            )
+            # 有内嵌 ID 的记录后写入，同一曲目以实际扫描到的文件为准
+            conn.executemany(
+                "INSERT OR REPLACE INTO library "
+                "(track_id, path, quality, size, mtime, indexed_at, "
+                "download_dir, file_format) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                kept + rows,
+            )
+
+        skipped = len(untagged) - len(kept)
+        if skipped:
+            logger.warning(
+                f"⚠️ {skipped} 个 FLAC 文件没有内嵌 {TRACK_ID_TAG} 标签，未能收录"
+            )
+        return len(rows) + len(kept)
+
+
+def _dir_key(download_dir) -> str:
+    return str(Path(download_dir).resolve())
+
+
+library_index = LibraryIndex()
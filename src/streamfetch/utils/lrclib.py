@@ -2,6 +2,8 @@ import requests
 import re
 import logging
 from urllib.parse import quote
+from streamfetch.utils.cache import LyricsCache, lyrics_cache
+from streamfetch.config.settings import config
 
 logger = logging.getLogger("streamfetch")
 
@@ -36,50 +38,63 @@ class LRCLib:
 
     @staticmethod
     def _fetch_get(artist: str, track: str):
-       
-        try:
-            params = {"artist_name": artist, "track_name": track}
-            resp = requests.get(
-                f"{LRCLib.BASE_URL}/get",
-                params=params,
-                headers=LRCLib.HEADERS,
-                timeout=10,
-            )
-            if resp.status_code == 200:
-                return resp.json()
-        except Exception:
-            pass
+        # 404 表示确实没有；其他异常向上抛出，避免把网络故障当成 "未找到" 缓存
+        params = {"artist_name": artist, "track_name": track}
+        resp = requests.get(
+            f"{LRCLib.BASE_URL}/get",
+            params=params,
+            headers=LRCLib.HEADERS,
+            timeout=10,
+        )
+        if resp.status_code == 200:
+            return resp.json()
+        if resp.status_code != 404:
+            resp.raise_for_status()
         return None
 
     @staticmethod
     def _fetch_search(query: str, duration_sec: float):
-        
-        try:
-            params = {"q": query}
-            resp = requests.get(
-                f"{LRCLib.BASE_URL}/search",
-                params=params,
-                headers=LRCLib.HEADERS,
-                timeout=10,
-            )
-            if resp.status_code == 200:
-                data = resp.json()
-                if isinstance(data, list):
-                    for item in data:
-                        item_dur = item.get("duration", 0)
-                        if abs(item_dur - duration_sec) <= 10:
-                          
-                            if item.get("syncedLyrics"):
-                                return item
-                         
-                            if item.get("plainLyrics"):
-                                return item
-        except Exception:
-            pass
+        params = {"q": query}
+        resp = requests.get(
+            f"{LRCLib.BASE_URL}/search",
+            params=params,
+            headers=LRCLib.HEADERS,
+            timeout=10,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        if isinstance(data, list):
+            for item in data:
+                item_dur = item.get("duration", 0)
+                if abs(item_dur - duration_sec) <= 10:
+                  
+                    if item.get("syncedLyrics"):
+                        return item
+                 
+                    if item.get("plainLyrics"):
+                        return item
         return None
 
     @staticmethod
     def get_lyrics(track_name: str, artist_name: str, duration_sec: float):
+        """查询 LRCLib，结果 (包括未找到) 按规范化的 歌手/歌名/时长 缓存"""
+        cache_key = LyricsCache.lookup_key(artist_name, track_name, duration_sec)
+        hit, lyrics = lyrics_cache.get(cache_key)
+        if hit:
+            return lyrics
+        if config["cache"]["offline"]:
+            return None
+
+        try:
+            lyrics = LRCLib._lookup(track_name, artist_name, duration_sec)
+        except Exception as e:
+            logger.debug(f"LRCLib 查询失败: {e}")
+            return None
+        lyrics_cache.put(cache_key, lyrics)
+        return lyrics
+
+    @staticmethod
+    def _lookup(track_name: str, artist_name: str, duration_sec: float):
 
         res = LRCLib._fetch_get(artist_name, track_name)
         if res and (res.get("syncedLyrics") or res.get("plainLyrics")):
@@ -0,0 +1,65 @@
+import math
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional
+
+
+class Metrics:
+    """
+    进程内的运行指标
+    计数器由各模块累加；仪表 (gauge) 注册为回调，读取时才取当前值；
+    耗时 (timing) 保留最近的样本，快照中给出分位数
+    """
+
+    # 每项耗时最多保留的样本数
+    MAX_SAMPLES = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._timings: Dict[str, deque] = {}
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def gauge(self, name: str, func: Callable[[], float]):
+        with self._lock:
+            self._gauges[name] = func
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            samples = self._timings.get(name)
+            if samples is None:
+                samples = self._timings[name] = deque(maxlen=self.MAX_SAMPLES)
+            samples.append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {name: sorted(samples) for name, samples in self._timings.items()}
+        return {
+            "counters": counters,
+            "gauges": {name: func() for name, func in sorted(gauges.items())},
+            "timings": {
+                name: {
+                    "count": len(samples),
+                    "p50": percentile(samples, 0.5),
+                    "p99": percentile(samples, 0.99),
+                }
+                for name, samples in sorted(timings.items())
+            },
+        }
+
+
+def percentile(samples, q: float) -> Optional[float]:
+    """已排序样本的 q 分位数 (0~1)，没有样本时返回 None"""
+    if not samples:
+        return None
+    idx = min(len(samples) - 1, max(0, math.ceil(q * len(samples)) - 1))
+    return samples[idx]
+
+
+metrics = Metrics()
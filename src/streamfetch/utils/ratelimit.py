@@ -0,0 +1,69 @@
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+from streamfetch.config.settings import config
+
+
+class TokenBucket:
+    """
+    令牌桶
+    rate 为每秒补充的令牌数，capacity 为允许的突发量；
+    令牌不足时先记账再等待，后来的调用排在后面，整体速率不超过 rate
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n: float = 1.0):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._stamp) * self.rate
+            )
+            self._stamp = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """按主机限制每秒请求数，只作用于 hosts 中的主机 (为空表示所有主机)"""
+
+    def __init__(self, rps: float, hosts: Iterable[str] = ()):
+        self.rps = rps
+        self.hosts = frozenset(hosts)
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def wait(self, url: str):
+        if self.rps <= 0:
+            return
+        host = urlsplit(url).netloc
+        if self.hosts and host not in self.hosts:
+            return
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                # 允许一秒内的突发，之后按 rps 匀速放行
+                bucket = TokenBucket(self.rps, max(1.0, self.rps))
+                self._buckets[host] = bucket
+        bucket.consume()
+
+
+# 全局下载带宽上限 (所有连接共享)
+bandwidth_limiter = TokenBucket(config["network"]["max_bandwidth_mb"] * 1024 * 1024)
+
+# API 镜像的请求速率上限，音频 CDN 不受影响
+request_limiter = HostRateLimiter(
+    config["network"]["requests_per_second"],
+    hosts=[urlsplit(url).netloc for url in config["network"]["api_urls"]],
+)
@@ -0,0 +1,138 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, Iterable, Optional, TypeVar
+
+import requests
+
+from streamfetch.config.settings import config
+from streamfetch.utils.http import TIMEOUT, HttpError
+
+logger = logging.getLogger("streamfetch")
+
+T = TypeVar("T")
+
+# 错误分类
+NOT_FOUND = "not_found"  # 404：资源不存在，重试没有意义
+RATE_LIMITED = "rate_limited"  # 429：被限流，退避后重试
+SERVER = "server"  # 5xx
+TIMEOUT_ERROR = "timeout"  # 连接/读取超时
+NETWORK = "network"  # 连接失败、连接被重置等
+CLIENT = "client"  # 其他 4xx
+INVALID = "invalid"  # 响应成功但内容不可用 (缺字段、JSON 损坏)
+UNKNOWN = "unknown"
+
+RETRYABLE = frozenset({RATE_LIMITED, SERVER, TIMEOUT_ERROR, NETWORK, INVALID})
+
+
+class InvalidResponse(Exception):
+    """接口返回成功，但内容缺少必要字段"""
+
+
+def classify_error(e: BaseException) -> str:
+    if isinstance(e, HttpError):
+        if e.status is None:
+            return TIMEOUT_ERROR if e.timeout else NETWORK
+        if e.status == 404:
+            return NOT_FOUND
+        if e.status == 429:
+            return RATE_LIMITED
+        if e.status >= 500:
+            return SERVER
+        return CLIENT
+    if isinstance(e, (InvalidResponse, requests.exceptions.JSONDecodeError)):
+        return INVALID
+    if isinstance(e, requests.exceptions.RequestException):
+        # 读取流式响应体时抛出的异常不会被 fetch_get 包装
+        if isinstance(e, requests.exceptions.Timeout):
+            return TIMEOUT_ERROR
+        return NETWORK
+    return UNKNOWN
+
+
+class RetryBudget:
+    """整次运行共享的重试预算，防止大面积故障时重试把请求量放大数倍"""
+
+    def __init__(self, total: int):
+        self.remaining = total
+        self._lock = threading.Lock()
+        self._warned = False
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.remaining > 0:
+                self.remaining -= 1
+                return True
+            if not self._warned:
+                self._warned = True
+                logger.warning("⚠️ 本次运行的重试预算已用尽，后续失败将不再重试")
+            return False
+
+
+class RetryPolicy:
+    """
+    统一的重试策略
+    - 每次调用有总期限 (deadline)，单次尝试的超时不会超过剩余时间
+    - 指数退避 + 完全抖动，429 时遵循 Retry-After
+    - 按错误类型决定是否重试，并从全局预算中扣减重试次数
+    """
+
+    def __init__(
+        self,
+        max_attempts: int,
+        deadline: float,
+        budget: RetryBudget,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        retry_on: Iterable[str] = RETRYABLE,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.deadline = deadline
+        self.budget = budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = frozenset(retry_on)
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def call(
+        self,
+        func: Callable[[float], T],
+        on_retry: Optional[Callable[[BaseException, str], None]] = None,
+    ) -> T:
+        """func 接收本次尝试可用的超时时间 (秒)"""
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            remaining = self.deadline - (time.monotonic() - start)
+            try:
+                return func(max(1.0, min(TIMEOUT, remaining)))
+            except Exception as e:
+                kind = classify_error(e)
+                attempt += 1
+                if kind not in self.retry_on or attempt >= self.max_attempts:
+                    raise
+                delay = self.backoff(attempt, e)
+                if time.monotonic() - start + delay >= self.deadline:
+                    raise
+                if not self.budget.try_spend():
+                    raise
+                logger.debug(f"第 {attempt} 次失败 ({kind})，{delay:.1f}s 后重试: {e}")
+                if on_retry is not None:
+                    on_retry(e, kind)
+                time.sleep(delay)
+
+
+retry_budget = RetryBudget(config["network"]["retry_budget"])
+
+retry_policy = RetryPolicy(
+    max_attempts=config["network"]["max_retries"] + 1,
+    deadline=config["network"]["request_deadline"],
+    budget=retry_budget,
+)
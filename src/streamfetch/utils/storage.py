@@ -0,0 +1,59 @@
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from streamfetch.config.settings import get_app_dir
+
+logger = logging.getLogger("streamfetch")
+
+DB_NAME = "streamfetch.db"
+
+
+class Database:
+    """
+    应用本地 SQLite 数据库 (与 config.yml 同目录)
+    所有线程共享一个连接，通过锁串行化访问；各模块在首次使用时自行建表。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        with self._lock:
+            # WAL 模式允许多个 sf 进程同时读写
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    @contextmanager
+    def cursor(self):
+        with self._lock:
+            yield self._conn
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def get_database() -> Database:
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = Database(get_app_dir() / DB_NAME)
+        return _database
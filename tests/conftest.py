@@ -0,0 +1,33 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+_ENV_KEYS = ("XDG_CONFIG_HOME", "APPDATA")
+_saved_env = {}
+_app_root = None
+
+
+def pytest_configure(config):
+    """
+    streamfetch 在导入时读取 config.yml，数据库也建在同一目录；
+    在收集测试 (导入被测模块) 之前把应用目录指向隔离的临时目录
+    """
+    global _app_root
+    _app_root = Path(tempfile.mkdtemp(prefix="sf-test-"))
+    app_dir = _app_root / "streamfetch"
+    app_dir.mkdir()
+    (app_dir / "config.yml").write_text("cache:\n  enabled: false\n", encoding="utf-8")
+    for key in _ENV_KEYS:
+        _saved_env[key] = os.environ.get(key)
+        os.environ[key] = str(_app_root)
+
+
+def pytest_unconfigure(config):
+    for key, value in _saved_env.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+    if _app_root is not None:
+        shutil.rmtree(_app_root, ignore_errors=True)
@@ -0,0 +1,27 @@
+from streamfetch.media.cover import CoverCache
+
+
+class FlakyCoverCache(CoverCache):
+    """第一次下载失败，之后成功"""
+
+    def __init__(self, cache_dir):
+        super().__init__(cache_dir, 1 << 20)
+        self.loads = 0
+
+    def _load(self, cover_id):
+        self.loads += 1
+        if self.loads == 1:
+            raise OSError("connection reset")
+        path = self._path(cover_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"jpeg")
+        return path
+
+
+def test_failed_cover_is_retried(tmp_path):
+    cache = FlakyCoverCache(tmp_path)
+    assert cache.get("abc") is None
+    assert cache.get("abc") == tmp_path / "abc.jpg"
+    # 成功的结果在本次运行内复用
+    assert cache.get("abc") == tmp_path / "abc.jpg"
+    assert cache.loads == 2
@@ -0,0 +1,113 @@
+import struct
+
+import pytest
+
+from streamfetch.bench.server import FRAME_SAMPLES, init_segment, media_segment
+from streamfetch.media.flac import (
+    PICTURE,
+    STREAMINFO,
+    TRACK_ID_TAG,
+    RemuxError,
+    read_flac_info,
+    remux_file,
+)
+
+METADATA = {
+    "id": 4242,
+    "title": "Title",
+    "artist": "Artist",
+    "album": "Album",
+    "trackNumber": 3,
+}
+
+# 32x16 的 PNG 文件头 (只需要 IHDR，封装器不解码图像)
+COVER = (
+    b"\x89PNG\r\n\x1a\n"
+    + struct.pack(">I4sIIBBBBB", 13, b"IHDR", 32, 16, 8, 2, 0, 0, 0)
+    + b"\0" * 4
+)
+
+# bench.server.media_segment 的布局：moof(mfhd, traf(tfhd, tfdt, trun)) + mdat
+_TRUN_COUNT = 8 + 16 + 8 + 16 + 16 + 8 + 4
+
+
+def _frames(segment):
+    """按 trun 中的样本长度切出 mdat 里的各个帧"""
+    count = struct.unpack_from(">I", segment, _TRUN_COUNT)[0]
+    sizes = struct.unpack_from(f">{count}I", segment, _TRUN_COUNT + 8)
+    moof_size = struct.unpack_from(">I", segment, 0)[0]
+    pos = moof_size + 8
+    frames = []
+    for size in sizes:
+        frames.append(segment[pos : pos + size])
+        pos += size
+    return frames
+
+
+def _blocks(data):
+    """解析 FLAC 文件头中的元数据块，返回 ({类型: 内容}, 音频起点)"""
+    assert data[:4] == b"fLaC"
+    blocks = {}
+    pos = 4
+    while True:
+        header = data[pos]
+        length = int.from_bytes(data[pos + 1 : pos + 4], "big")
+        blocks[header & 0x7F] = data[pos + 4 : pos + 4 + length]
+        pos += 4 + length
+        if header & 0x80:
+            return blocks, pos
+
+
+def _remux(tmp_path, segments):
+    audio = tmp_path / "audio.mp4"
+    audio.write_bytes(init_segment() + b"".join(segments))
+    cover = tmp_path / "cover.png"
+    cover.write_bytes(COVER)
+    lyrics = tmp_path / "lyrics.txt"
+    lyrics.write_text("[00:01.00]hello", encoding="utf-8")
+    final = tmp_path / "out.flac"
+    # 小块读入，覆盖盒子跨越多次 write 的情况
+    remux_file(audio, cover, lyrics, METADATA, final, chunk_size=4096)
+    return final
+
+
+def test_remux_round_trip(tmp_path):
+    segments = [media_segment(20000, 1), media_segment(30000, 2)]
+    frames = [f for s in segments for f in _frames(s)]
+    final = _remux(tmp_path, segments)
+
+    data = final.read_bytes()
+    blocks, audio_start = _blocks(data)
+    assert data[audio_start:] == b"".join(frames)
+
+    info = blocks[STREAMINFO]
+    assert int.from_bytes(info[4:7], "big") == min(len(f) for f in frames)
+    assert int.from_bytes(info[7:10], "big") == max(len(f) for f in frames)
+    total = int.from_bytes(info[10:18], "big") & ((1 << 36) - 1)
+    assert total == FRAME_SAMPLES * len(frames)
+
+    tags = read_flac_info(final)["tags"]
+    assert tags["TITLE"] == "Title"
+    assert tags["ARTIST"] == "Artist"
+    assert tags["ALBUM"] == "Album"
+    assert tags["TRACKNUMBER"] == "3"
+    assert tags[TRACK_ID_TAG] == "4242"
+    assert tags["LYRICS"] == "[00:01.00]hello"
+
+    picture = blocks[PICTURE]
+    kind, mime_len = struct.unpack_from(">II", picture, 0)
+    assert kind == 3
+    assert picture[8 : 8 + mime_len] == b"image/png"
+    pos = 8 + mime_len + 4
+    width, height, _, _, size = struct.unpack_from(">IIIII", picture, pos)
+    assert (width, height) == (32, 16)
+    assert picture[pos + 20 : pos + 20 + size] == COVER
+
+
+def test_malformed_moof_raises_remux_error(tmp_path):
+    segment = bytearray(media_segment(20000, 1))
+    # trun 声明的样本数远超实际数据，解析时越界
+    struct.pack_into(">I", segment, _TRUN_COUNT, 0xFFFF)
+    with pytest.raises(RemuxError):
+        _remux(tmp_path, [bytes(segment)])
+    assert not (tmp_path / "out.flac").exists()
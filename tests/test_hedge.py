@@ -0,0 +1,43 @@
+import threading
+import time
+
+from streamfetch.tidal import api as api_module
+from streamfetch.tidal.api import TidalApi
+
+
+class SlowPrimaryApi(TidalApi):
+    """主镜像一直卡到 release 被触发，备用镜像立即返回"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def _request_json(self, base_url, path, params=None, timeout=None):
+        if base_url == "primary":
+            self.release.wait(5)
+        return {"from": base_url}
+
+
+def test_hedged_backup_wins_over_stuck_primary():
+    api = SlowPrimaryApi()
+    try:
+        result = api._hedged_get_json("/x/", {}, ["primary", "backup"], 0.01)
+        assert result == {"from": "backup"}
+    finally:
+        api.release.set()
+
+
+def test_abandoned_losers_do_not_queue_new_calls():
+    api = SlowPrimaryApi()
+    started = time.monotonic()
+    try:
+        # 每次调用都留下一个卡住的主请求，直到线程池只剩一个空闲线程
+        for _ in range(api_module.HEDGE_WORKERS - 1):
+            api._hedged_get_json("/x/", {}, ["primary", "backup"], 0.01)
+
+        result = api._hedged_get_json("/x/", {}, ["backup", "primary"], 0.01)
+        assert result == {"from": "backup"}
+        # 所有调用都不曾排队等待卡住的请求
+        assert time.monotonic() - started < 2
+    finally:
+        api.release.set()
@@ -0,0 +1,76 @@
+import base64
+
+import pytest
+
+from streamfetch.bench.server import _manifest
+from streamfetch.dash.journal import DownloadJournal
+from streamfetch.tidal.downloader import TidalDownloader
+
+SEGMENTS = 12
+
+
+def _data(idx):
+    return bytes([idx]) * 100
+
+
+class FlakyDownloader(TidalDownloader):
+    """fail_at 号分段第一次请求失败，记录每个被请求的分段"""
+
+    def __init__(self, fail_at=None):
+        super().__init__(api=None)
+        self.fail_at = fail_at
+        self.fetched = []
+
+    def _fetch_segment(self, segment_urls, idx, guard):
+        self.fetched.append(idx)
+        if idx == self.fail_at:
+            self.fail_at = None
+            raise OSError("connection reset")
+        return _data(idx)
+
+
+def _manifest_xml(segments):
+    return base64.b64decode(_manifest("http://cdn", "3001", segments)).decode()
+
+
+def _open(partial_dir):
+    journal = DownloadJournal.open(partial_dir, "3001", "LOSSLESS")
+    if journal.manifest is None:
+        journal.update_manifest(_manifest_xml(SEGMENTS))
+    return journal
+
+
+def test_resume_after_mid_track_failure(tmp_path):
+    journal = _open(tmp_path)
+    downloader = FlakyDownloader(fail_at=5)
+    with pytest.raises(Exception):
+        downloader.download_dash(journal.manifest, journal.data_path, journal=journal)
+
+    # 重新打开日志，相当于下次运行
+    journal = _open(tmp_path)
+    total = journal.state["total"]
+    assert journal.segments == 5
+    assert journal.bytes == 5 * 100
+
+    downloader = FlakyDownloader()
+    downloader.download_dash(journal.manifest, journal.data_path, journal=journal)
+    assert min(downloader.fetched) == 5
+    assert journal.data_path.read_bytes() == b"".join(
+        _data(i) for i in range(total)
+    )
+    assert _open(tmp_path).segments == total
+
+
+def test_changed_manifest_restarts_from_scratch(tmp_path):
+    journal = _open(tmp_path)
+    with pytest.raises(Exception):
+        FlakyDownloader(fail_at=5).download_dash(
+            journal.manifest, journal.data_path, journal=journal
+        )
+
+    # 分段列表不同的新 manifest 不能接着旧的部分文件写
+    journal = _open(tmp_path)
+    journal.update_manifest(_manifest_xml(SEGMENTS + 1))
+    downloader = FlakyDownloader()
+    downloader.download_dash(journal.manifest, journal.data_path, journal=journal)
+    assert min(downloader.fetched) == 0
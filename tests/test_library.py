@@ -0,0 +1,70 @@
+from streamfetch.config.settings import config
+from streamfetch.tidal.downloader import TidalDownloader
+from streamfetch.utils.library import library_index
+
+META = {
+    "title": "Title",
+    "artist": "Artist",
+    "album": "Album",
+    "trackNumber": 1,
+    "duration": 0,
+}
+
+
+class FakeApi:
+    def __init__(self):
+        self.metadata_calls = 0
+
+    def get_metadata(self, track_id):
+        self.metadata_calls += 1
+        return dict(META)
+
+    def get_lyrics(self, track_id):
+        return None
+
+
+def _index_existing(track_id, download_dir, file_format=None):
+    path = download_dir / "Artist" / "Album" / "Title.flac"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"fLaC")
+    library_index.record(
+        track_id,
+        path,
+        download_dir=download_dir,
+        file_format=file_format or config["naming"]["file_format"],
+    )
+    return path
+
+
+def test_indexed_track_in_same_dir_is_skipped_without_api(tmp_path):
+    api = FakeApi()
+    downloader = TidalDownloader(api)
+    _index_existing("1001", tmp_path / "music")
+
+    job = downloader.new_job("1001", tmp_path / "music")
+    assert downloader.prepare_track(job) is None
+    assert api.metadata_calls == 0
+
+
+def test_indexed_track_in_other_dir_is_downloaded(tmp_path):
+    downloader = TidalDownloader(FakeApi())
+    _index_existing("1002", tmp_path / "old")
+
+    job = downloader.new_job("1002", tmp_path / "new")
+    assert downloader.prepare_track(job) is job
+    assert job.final_path == tmp_path / "new" / "Artist" / "Album" / "Title.flac"
+
+
+def test_changed_file_format_recomputes_path(tmp_path):
+    api = FakeApi()
+    downloader = TidalDownloader(api)
+    # 旧格式写入的记录：路径恰好与新格式一致时按已存在跳过，并更新为当前配置
+    _index_existing("1003", tmp_path / "music", file_format="{Title}")
+
+    job = downloader.new_job("1003", tmp_path / "music")
+    assert downloader.prepare_track(job) is None
+    assert api.metadata_calls == 1
+
+    job = downloader.new_job("1003", tmp_path / "music")
+    assert downloader.prepare_track(job) is None
+    assert api.metadata_calls == 1
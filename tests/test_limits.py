@@ -0,0 +1,45 @@
+import time
+
+from streamfetch.utils.adaptive import AdaptiveLimiter
+from streamfetch.utils.ratelimit import TokenBucket
+
+
+def test_congestion_halves_window_once_per_episode():
+    limiter = AdaptiveLimiter("cdn", minimum=2, maximum=32, initial=16)
+    started = [limiter.acquire() for _ in range(2)]
+
+    limiter.release(started[0], congested=True)
+    assert limiter.window == 8
+    # 减半之前发出的请求再失败属于同一次拥塞
+    limiter.release(started[1], congested=True)
+    assert limiter.window == 8
+
+    limiter.release(limiter.acquire(), congested=True)
+    assert limiter.window == 4
+    limiter.release(limiter.acquire(), congested=True)
+    limiter.release(limiter.acquire(), congested=True)
+    assert limiter.window == 2
+
+
+def test_window_grows_while_throughput_improves():
+    limiter = AdaptiveLimiter("cdn", minimum=1, maximum=4, initial=1)
+    for _ in range(10):
+        limiter.release(limiter.acquire(), nbytes=1 << 20)
+    assert limiter.window > 1
+    assert limiter.window <= 4
+
+
+def test_token_bucket_limits_rate_after_burst():
+    bucket = TokenBucket(1000, 100)
+    started = time.monotonic()
+    bucket.consume(100)
+    assert time.monotonic() - started < 0.05
+    bucket.consume(100)
+    assert time.monotonic() - started >= 0.09
+
+
+def test_disabled_token_bucket_never_waits():
+    bucket = TokenBucket(0)
+    started = time.monotonic()
+    bucket.consume(1 << 30)
+    assert time.monotonic() - started < 0.05
@@ -0,0 +1,41 @@
+import time
+
+from streamfetch.tidal import mirrors
+from streamfetch.tidal.mirrors import CLOSED, OPEN, MirrorPool
+
+
+def _wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_breaker_trips_after_consecutive_failures():
+    pool = MirrorPool(["http://a", "http://b"], failure_threshold=2, cooldown=60)
+    pool.report_failure("http://a")
+    assert pool._mirrors["http://a"].state == CLOSED
+    pool.report_failure("http://a")
+    assert pool._mirrors["http://a"].state == OPEN
+    assert pool.ranked() == ["http://b"]
+
+
+def test_probe_survives_unexpected_errors(monkeypatch):
+    calls = []
+
+    def fetch_get(url, *args, **kwargs):
+        calls.append(url)
+        if len(calls) == 1:
+            raise ValueError("unexpected")
+        return None
+
+    monkeypatch.setattr(mirrors, "fetch_get", fetch_get)
+    pool = MirrorPool(["http://a", "http://b"], failure_threshold=1, cooldown=0.01)
+    pool.report_failure("http://a")
+
+    # 第一次探测抛出非 HttpError 的异常：镜像重新熔断，探测线程继续运行
+    assert _wait_for(lambda: pool._mirrors["http://a"].state == CLOSED)
+    assert len(calls) == 2
+    assert _wait_for(lambda: pool._prober is None)
@@ -0,0 +1,50 @@
+from streamfetch.tidal.sync import PlaylistSync
+from streamfetch.utils.library import library_index
+
+
+class FakeApi:
+    def __init__(self, track_ids):
+        self.track_ids = track_ids
+        self.version = 0
+
+    def get_playlist_head(self, playlist_id, fresh=False):
+        self.version += 1
+        first = [{"id": i} for i in self.track_ids]
+        return {"title": playlist_id, "lastUpdated": self.version}, first
+
+    def iter_playlist(self, playlist_id, fresh=False, first=None):
+        # 第一页必须由 get_playlist_head 传入，不能重新请求
+        assert first is not None
+        return first
+
+
+class FakeDownloader:
+    """与真实下载器一致：已在曲库中的歌曲跳过，只返回实际下载的 ID"""
+
+    def download_playlist(self, tracks, download_dir):
+        return [
+            _write(str(t["id"]), download_dir)
+            for t in tracks
+            if library_index.lookup(t["id"]) is None
+        ]
+
+
+def _write(track_id, download_dir):
+    path = download_dir / f"{track_id}.flac"
+    path.write_bytes(b"fLaC")
+    library_index.record(track_id, path)
+    return track_id
+
+
+def test_prune_keeps_files_not_downloaded_by_sync(tmp_path):
+    # 2001 同步前已在曲库中，2002 由 sync 下载
+    _write("2001", tmp_path)
+    api = FakeApi(["2001", "2002"])
+    sync = PlaylistSync(api, FakeDownloader())
+    sync.run("pl-prune", tmp_path)
+
+    api.track_ids = []
+    sync.run("pl-prune", tmp_path, prune=True)
+
+    assert (tmp_path / "2001.flac").exists()
+    assert not (tmp_path / "2002.flac").exists()
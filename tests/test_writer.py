@@ -0,0 +1,73 @@
+import io
+import threading
+
+from streamfetch.dash.writer import SegmentWriter
+
+
+def _blocked(func):
+    """在后台线程中运行 func，返回 (线程, 完成事件)"""
+    done = threading.Event()
+
+    def run():
+        func()
+        done.set()
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    return t, done
+
+
+def test_out_of_order_segments_are_written_in_order():
+    out = io.BytesIO()
+    flushes = []
+    writer = SegmentWriter(out, 4, on_flush=lambda n, nbytes: flushes.append(n))
+    for _ in range(4):
+        writer.acquire()
+
+    writer.put(2, b"cc")
+    writer.put(1, b"bb")
+    assert out.getvalue() == b""
+    assert writer.written == 0
+
+    writer.put(0, b"aa")
+    assert out.getvalue() == b"aabbcc"
+    assert writer.written == 3
+    writer.put(3, b"dd")
+    assert out.getvalue() == b"aabbccdd"
+    assert flushes == [3, 4]
+
+
+def test_resume_starts_after_written_segments():
+    out = io.BytesIO(b"aabb")
+    out.seek(4)
+    writer = SegmentWriter(out, 2, start=2)
+    writer.acquire()
+    writer.put(2, b"cc")
+    assert writer.written == 3
+    assert out.getvalue() == b"aabbcc"
+
+
+def test_full_window_blocks_until_next_segment_is_flushed():
+    writer = SegmentWriter(io.BytesIO(), 2)
+    writer.acquire()
+    writer.acquire()
+
+    _, done = _blocked(writer.acquire)
+    assert not done.wait(0.1)
+    # 乱序到达的分段仍占着窗口，不释放名额
+    writer.put(1, b"b")
+    assert not done.wait(0.1)
+    writer.put(0, b"a")
+    assert done.wait(1)
+
+
+def test_abort_wakes_blocked_submitter():
+    writer = SegmentWriter(io.BytesIO(), 1)
+    writer.acquire()
+
+    _, done = _blocked(writer.acquire)
+    assert not done.wait(0.1)
+    error = RuntimeError("segment failed")
+    writer.abort(error)
+    assert done.wait(1)
+    assert writer.error is error